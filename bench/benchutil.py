@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# benchutil.py, provides common setup and statistics for the benchmarks
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import os.path
+import platform
+import tempfile
+import shutil
+import atexit
+import statistics
+import json
+import time
+
+sourceDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'source')
+
+def setupPaths():
+    """Make the rpCalc modules importable and use a scratch config dir.
+
+    The option file is written to a temporary home directory so that
+    benchmarks start from the defaults and never change the user's file.
+    The directory is removed at exit.
+    """
+    if sourceDir not in sys.path:
+        sys.path.insert(0, sourceDir)
+    homeDir = tempfile.mkdtemp(prefix='rpcalc-bench-')
+    atexit.register(shutil.rmtree, homeDir, ignore_errors=True)
+    os.environ['HOME'] = homeDir
+    os.environ['APPDATA'] = homeDir
+    return homeDir
+
+def summarize(samples):
+    """Return a dict of statistics for a list of times in seconds.
+
+    Times in the result are in microseconds.
+    """
+    values = sorted(samples)
+    count = len(values)
+    return {'count': count,
+            'minUs': values[0] * 1e6,
+            'medianUs': statistics.median(values) * 1e6,
+            'meanUs': statistics.mean(values) * 1e6,
+            'stdevUs': (statistics.stdev(values) * 1e6 if count > 1
+                        else 0.0),
+            'p95Us': values[min(int(0.95 * count), count - 1)] * 1e6,
+            'p99Us': values[min(int(0.99 * count), count - 1)] * 1e6,
+            'maxUs': values[-1] * 1e6}
+
+def metadata():
+    """Return a dict describing the machine and software versions.
+    """
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine()}
+
+def writeResults(results, path=''):
+    """Write results as JSON to path, or to stdout if path is empty.
+    """
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
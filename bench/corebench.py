@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# corebench.py, microbenchmarks for the non-GUI classes with thresholds
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import os.path
+import getopt
+import itertools
+import json
+import timeit
+import fnmatch
+import benchutil
+
+homeDir = benchutil.setupPaths()
+
+import calccore
+import calcstack
+import option
+import optiondefaults
+
+# commands timed individually, with sequences for prompted commands
+cmdList = ['+', '-', '*', '/', 'ENT', 'X<>Y', 'CHS', 'CLR', '<-', 'EXP',
+           'X^2', 'SQRT', 'Y^X', 'XRT', 'RCIP', 'SIN', 'COS', 'TAN', 'LN',
+           'E^X', 'ASIN', 'ACOS', 'ATAN', 'LOG', 'TN^X', 'R<', 'R>', 'PI',
+           'SCI', 'DEG', 'STO 3', 'RCL 3', 'PLCS 4', '5', 'S+', 'S-',
+           'MEAN', 'SDEV', 'SUM', 'LR', 'CORR', 'YEST', 'MED', 'PCTL',
+           'IQR']
+# commands that use the statistics registers, reset before each run with
+# the reset time subtracted
+statCmds = {'S+', 'S-', 'MEAN', 'SDEV', 'SUM', 'LR', 'CORR', 'YEST', 'MED',
+            'PCTL', 'IQR'}
+startStack = [0.5, 2.0, 3.0, 4.0]
+formatOptions = ['ForceSciNotation', 'UseEngNotation', 'ThousandsSeparator',
+                 'TrimExponents']
+formatNums = [0.0, 1.5, -1234567.891, 6.02e23, 1.6e-19]
+bitSizes = [4, 8, 16, 32, 64, 128]
+largeConfigLines = 5000
+defaultThresholdPath = os.path.join(os.path.dirname(os.path.
+                                                    abspath(__file__)),
+                                    'thresholds.json')
+
+def usage(exitCode=2):
+    """Display usage info and exit.
+    """
+    print('Usage:')
+    print('    python corebench.py [-h] [-k pattern] [-r repeats] [-o file]')
+    print('                        [-t file] [-w factor]')
+    print('where:')
+    print('    -h          display this help message')
+    print('    -k pattern  only run benchmarks with names matching the '
+          'wildcard pattern')
+    print('    -r repeats  number of timing repeats [default: 7]')
+    print('    -o file     JSON output file [default: stdout]')
+    print('    -t file     threshold file [default: thresholds.json]')
+    print('    -w factor   write new thresholds of factor times the '
+          'medians')
+    print('Exits with status 1 if any median exceeds its threshold.')
+    sys.exit(exitCode)
+
+def newCalc():
+    """Return a CalcCore with a known stack and some statistics data.
+    """
+    calc = calccore.CalcCore()
+    calc.stack.replaceAll(startStack)
+    for i in range(1000):
+        calc.stat.addPoint(float(i), 2.0 * i + 1.0)
+    return calc
+
+def cmdBenchmarks():
+    """Return (name, function) pairs for each command.
+
+    Statistics commands start from the same data on every run, so their
+    times don't depend on how often S+ and S- ran before.  Their entries
+    add a function that only resets the data, whose time is subtracted.
+    """
+    calc = newCalc()
+    statSample = calc.stat.copy()
+    def resetStat():
+        calc.stat = statSample.copy()
+    benchmarks = []
+    for cmdText in cmdList:
+        def runCmd(cmds=cmdText.split(), usesStat=cmdText in statCmds):
+            calc.stack.replaceAll(startStack)
+            calc.flag = calccore.Mode.saveMode
+            if usesStat:
+                resetStat()
+            for cmd in cmds:
+                calc.cmd(cmd)
+        if cmdText in statCmds:
+            benchmarks.append(('cmd ' + cmdText, runCmd, resetStat))
+        else:
+            benchmarks.append(('cmd ' + cmdText, runCmd))
+    return benchmarks
+
+def formatBenchmarks():
+    """Return (name, function) pairs for formatNum with each option set.
+    """
+    benchmarks = []
+    for settings in itertools.product(('no', 'yes'),
+                                      repeat=len(formatOptions)):
+        calc = calccore.CalcCore()
+        for key, value in zip(formatOptions, settings):
+            calc.option.changeData(key, value, False)
+        name = '+'.join(key for key, value in zip(formatOptions, settings)
+                        if value == 'yes') or 'fixed'
+        def runFormat(calc=calc):
+            for num in formatNums:
+                calc.formatNum(num)
+        benchmarks.append(('formatNum ' + name, runFormat))
+    return benchmarks
+
+def baseBenchmarks():
+    """Return (name, function) pairs for base conversions at each size.
+    """
+    benchmarks = []
+    for bits, twosComp in itertools.product(bitSizes, (False, True)):
+        calc = calccore.CalcCore()
+        calc.numBits = bits
+        calc.useTwosComplement = twosComp
+        calc.base = 16
+        num = float(2 ** (bits - 2) - 1)
+        numStr = calc.numberStr(num, 16)
+        suffix = '{0}bit{1}'.format(bits, '-twos' if twosComp else '')
+        def runNumberStr(calc=calc, num=num):
+            calc.numberStr(num, 2)
+            calc.numberStr(-num, 16)
+        def runConvertNum(calc=calc, numStr=numStr):
+            calc.convertNum(numStr)
+        benchmarks.append(('numberStr ' + suffix, runNumberStr))
+        benchmarks.append(('convertNum ' + suffix, runConvertNum))
+    return benchmarks
+
+def stackBenchmarks():
+    """Return (name, function) pairs for the stack primitives.
+    """
+    stack = calcstack.CalcStack(startStack)
+    return [('stack replaceXY', lambda: stack.replaceXY(1.0)),
+            ('stack enterX', stack.enterX),
+            ('stack rollBack', stack.rollBack),
+            ('stack rollUp', stack.rollUp),
+            ('stack replaceAll', lambda: stack.replaceAll(startStack))]
+
+def optionBenchmarks():
+    """Return (name, function) pairs for option lookups and file writes.
+    """
+    opt = option.Option('rpcalc', 20)
+    opt.loadAll(optiondefaults.defaultList)
+    largePath = os.path.join(homeDir, 'large-config')
+    with open(largePath, 'w', encoding='utf-8') as f:
+        f.writelines(line + '\n' for line in optiondefaults.defaultList)
+        f.writelines('Extra{0:<15}{0}\n'.format(i) for i in
+                     range(largeConfigLines))
+    largeOpt = option.Option('', 20)
+    largeOpt.path = largePath
+    largeOpt.loadAll(optiondefaults.defaultList)
+    counter = itertools.count()
+    def runWrite():
+        value = repr(float(next(counter)))
+        largeOpt.changeData('Stack0', value, True)
+        largeOpt.changeData('Mem9', value, True)
+        largeOpt.writeChanges()
+    return [('option boolData', lambda: opt.boolData('SaveStacks')),
+            ('option intData', lambda: opt.intData('NumDecimalPlaces', 0,
+                                                    9)),
+            ('option numData', lambda: opt.numData('Stack0')),
+            ('option strData', lambda: opt.strData('AngleUnit')),
+            ('option writeChanges {0} lines'.format(largeConfigLines),
+             runWrite)]
+
+def allBenchmarks():
+    """Return all (name, function) pairs, some with a baseline function.
+    """
+    return (cmdBenchmarks() + formatBenchmarks() + baseBenchmarks() +
+            stackBenchmarks() + optionBenchmarks() +
+            [('CalcCore construction', calccore.CalcCore)])
+
+def timeBenchmark(func, repeats, baseline=None):
+    """Return a list of per-call times in seconds for func.
+
+    The number of calls per repeat is calibrated to take about 0.2 sec.
+    The median time of a baseline function, for setup work done inside
+    func, is subtracted.
+    """
+    timer = timeit.Timer(func)
+    number, total = timer.autorange()
+    times = [total / number for total in timer.repeat(repeats, number)]
+    if baseline:
+        baseTimes = sorted(timeBenchmark(baseline, repeats))
+        baseTime = baseTimes[len(baseTimes) // 2]
+        times = [max(callTime - baseTime, 0.0) for callTime in times]
+    return times
+
+def main():
+    """Run the benchmarks, check thresholds and write the results.
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hk:r:o:t:w:')
+    except getopt.GetoptError:
+        usage(2)
+    pattern = '*'
+    repeats = 7
+    outPath = ''
+    thresholdPath = defaultThresholdPath
+    writeFactor = 0.0
+    for opt, val in opts:
+        if opt == '-h':
+            usage(0)
+        elif opt == '-k':
+            pattern = val
+        elif opt == '-r':
+            repeats = int(val)
+        elif opt == '-o':
+            outPath = val
+        elif opt == '-t':
+            thresholdPath = val
+        elif opt == '-w':
+            writeFactor = float(val)
+    thresholds = {}
+    if not writeFactor and os.path.exists(thresholdPath):
+        with open(thresholdPath, 'r', encoding='utf-8') as f:
+            thresholds = json.load(f)
+    results = {}
+    failures = []
+    for name, func, *baseline in allBenchmarks():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        stats = benchutil.summarize(timeBenchmark(func, repeats, *baseline))
+        limit = thresholds.get(name)
+        if limit is not None:
+            stats['thresholdUs'] = limit
+            if stats['medianUs'] > limit:
+                failures.append(name)
+        results[name] = stats
+    benchutil.writeResults({'meta': benchutil.metadata(),
+                            'results': results, 'failures': failures},
+                           outPath)
+    if writeFactor:
+        with open(thresholdPath, 'w', encoding='utf-8') as f:
+            json.dump({name: round(stats['medianUs'] * writeFactor, 2)
+                       for name, stats in results.items()}, f, indent=2,
+                      sort_keys=True)
+            f.write('\n')
+    if failures:
+        print('Threshold exceeded:', ', '.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
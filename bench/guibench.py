@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# guibench.py, runs scripted key presses through the main dialog offscreen
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import os
+import getopt
+import time
+import itertools
+import benchutil
+
+benchutil.setupPaths()
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QEvent, Qt, QT_VERSION_STR
+from PyQt5.QtGui import QKeyEvent
+from PyQt5.QtWidgets import QApplication
+import calcdlg
+
+# key press scripts - '\r' is enter, letters are typed commands
+scripts = {'numEntry': '123456.789\r98.76+',
+           'arithmetic': '3\r4+2*7-9/',
+           'typedCmds': '30sin\r45cos+2sqrt*',
+           'stackOps': '1\r2\r3\rr<r>+clr'}
+
+# the views that can be open - each scenario is a combination of these
+viewNames = ('reg', 'extra', 'alt')
+
+symbolKeys = {'\r': Qt.Key_Return, '.': Qt.Key_Period, '+': Qt.Key_Plus,
+              '-': Qt.Key_Minus, '*': Qt.Key_Asterisk, '/': Qt.Key_Slash,
+              '<': Qt.Key_Less, '>': Qt.Key_Greater, '^': Qt.Key_AsciiCircum,
+              ':': Qt.Key_Colon}
+
+def usage(exitCode=2):
+    """Display usage info and exit.
+    """
+    print('Usage:')
+    print('    python guibench.py [-h] [-r repeats] [-s scenarios] [-o file]')
+    print('where:')
+    print('    -h            display this help message')
+    print('    -r repeats    number of times to run each script '
+          '[default: 200]')
+    print('    -s scenarios  comma-separated view combinations, such as '
+          '"none,reg+alt"')
+    print('                  [default: all combinations of {0}]'.
+          format(', '.join(viewNames)))
+    print('    -o file       JSON output file [default: stdout]')
+    sys.exit(exitCode)
+
+def keyCode(char):
+    """Return the Qt key code for a script character.
+    """
+    if char.isdigit():
+        return Qt.Key_0 + int(char)
+    if char.isalpha():
+        return getattr(Qt, 'Key_' + char.upper())
+    return symbolKeys[char]
+
+def allScenarios():
+    """Return names for every combination of the open views.
+    """
+    names = []
+    for size in range(len(viewNames) + 1):
+        for combo in itertools.combinations(viewNames, size):
+            names.append('+'.join(combo) or 'none')
+    return names
+
+def openDialog(scenario):
+    """Create and show a main dialog with the scenario's views open.
+    """
+    dlg = calcdlg.CalcDlg()
+    dlg.show()
+    views = scenario.split('+')
+    if dlg.calc.option.boolData('ViewRegisters') != ('reg' in views):
+        dlg.toggleReg()
+    if 'extra' in views:
+        dlg.viewReg()
+    if 'alt' in views:
+        dlg.viewAltBases()
+    dlg.issueCmd('CLR')
+    dlg.flushUpdate()
+    return dlg
+
+def sendKey(dlg, char):
+    """Send a key press and release for char to the dialog.
+    """
+    key = keyCode(char)
+    dlg.keyPressEvent(QKeyEvent(QEvent.KeyPress, key, Qt.NoModifier, char))
+    dlg.keyReleaseEvent(QKeyEvent(QEvent.KeyRelease, key, Qt.NoModifier,
+                                  char))
+
+def paintAll(dlg):
+    """Do any pending update and repaint all open windows synchronously.
+    """
+    dlg.flushUpdate()
+    for win in (dlg, dlg.extraView, dlg.altBaseView):
+        if win and win.isVisible():
+            win.repaint()
+
+def frameRun(dlg, script, repeats):
+    """Return a list of times for each key press through to the repaint.
+    """
+    times = []
+    for char in script * repeats:
+        start = time.perf_counter()
+        sendKey(dlg, char)
+        paintAll(dlg)
+        times.append(time.perf_counter() - start)
+    return times
+
+def burstRun(app, dlg, script, repeats):
+    """Return total time to send keys as fast as the event loop allows.
+
+    Display updates are left to the dialog's refresh scheduler.
+    """
+    start = time.perf_counter()
+    for char in script * repeats:
+        sendKey(dlg, char)
+        app.processEvents()
+    paintAll(dlg)
+    return time.perf_counter() - start
+
+def main():
+    """Run the benchmarks and write the results.
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hr:s:o:')
+    except getopt.GetoptError:
+        usage(2)
+    repeats = 200
+    scenarios = allScenarios()
+    outPath = ''
+    for opt, val in opts:
+        if opt == '-h':
+            usage(0)
+        elif opt == '-r':
+            repeats = int(val)
+        elif opt == '-s':
+            scenarios = val.split(',')
+        elif opt == '-o':
+            outPath = val
+    app = QApplication(sys.argv[:1])
+    results = []
+    for scenario in scenarios:
+        dlg = openDialog(scenario)
+        for scriptName, script in sorted(scripts.items()):
+            frameRun(dlg, script, 5)    # warm up
+            times = frameRun(dlg, script, repeats)
+            burstTime = burstRun(app, dlg, script, repeats)
+            numEvents = len(script) * repeats
+            results.append({'scenario': scenario, 'script': scriptName,
+                            'events': numEvents,
+                            'frameTime': benchutil.summarize(times),
+                            'frameEventsPerSec': numEvents / sum(times),
+                            'burstEventsPerSec': numEvents / burstTime})
+        for win in (dlg.extraView, dlg.altBaseView, dlg):
+            if win:
+                win.close()
+        app.processEvents()
+    benchutil.writeResults({'meta': dict(benchutil.metadata(),
+                                         qt=QT_VERSION_STR),
+                            'results': results}, outPath)
+
+
+if __name__ == '__main__':
+    main()
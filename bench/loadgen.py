@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# loadgen.py, measures the request rate and latency of an rpCalc server
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import os.path
+import getopt
+import json
+import time
+import asyncio
+import subprocess
+import benchutil
+
+defaultCmds = '2 3 + 4 * SQRT 1.5 Y^X 10 LOG /'
+
+def usage(exitCode=2):
+    """Display usage info and exit.
+    """
+    print('Usage:')
+    print('    python loadgen.py [-h] [-s socket | -l sessions] '
+          '[-c connections]')
+    print('                      [-d seconds] [-w seconds] [-e cmds] '
+          '[-o file]')
+    print('where:')
+    print('    -h              display this help message')
+    print('    -s socket       server socket path [default: the rpcalc '
+          'default]')
+    print('    -l sessions     launch a server with this many sessions on '
+          'a temporary socket')
+    print('    -c connections  concurrent client connections [default: 8]')
+    print('    -d seconds      measured run time [default: 10]')
+    print('    -w seconds      warm up time before measuring [default: 1]')
+    print('    -e cmds         numbers and commands for each request')
+    print('    -o file         JSON output file [default: stdout]')
+    sys.exit(exitCode)
+
+def launchServer(numSessions):
+    """Start a server process on a temporary socket, return it and the path.
+    """
+    homeDir = benchutil.setupPaths()
+    path = os.path.join(homeDir, 'rpcalc.sock')
+    process = subprocess.Popen([sys.executable,
+                                os.path.join(benchutil.sourceDir,
+                                             'rpcalc.py'),
+                                '--serve=' + path,
+                                '--sessions={0}'.format(numSessions)],
+                               stdout=subprocess.DEVNULL)
+    for i in range(200):
+        if os.path.exists(path):
+            return process, path
+        time.sleep(0.05)
+    process.terminate()
+    print('Error - the server did not start')
+    sys.exit(1)
+
+async def runClient(path, request, measureTime, endTime, times):
+    """Send requests one at a time until endTime.
+
+    Latencies of requests sent after measureTime are added to times.
+    Returns the number of error responses.
+    """
+    reader, writer = await asyncio.open_unix_connection(path)
+    numErrors = 0
+    try:
+        while True:
+            sendTime = time.perf_counter()
+            if sendTime >= endTime:
+                return numErrors
+            writer.write(request)
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            if sendTime >= measureTime:
+                times.append(time.perf_counter() - sendTime)
+                if response.get('error'):
+                    numErrors += 1
+    finally:
+        writer.close()
+
+async def runLoad(path, cmds, numClients, warmTime, runTime):
+    """Run the clients and return the latencies, errors and elapsed time.
+    """
+    request = json.dumps({'cmds': cmds}).encode('utf-8') + b'\n'
+    startTime = time.perf_counter()
+    measureTime = startTime + warmTime
+    endTime = measureTime + runTime
+    times = []
+    errorCounts = await asyncio.gather(*[runClient(path, request,
+                                                   measureTime, endTime,
+                                                   times)
+                                         for i in range(numClients)])
+    return times, sum(errorCounts), time.perf_counter() - measureTime
+
+def main():
+    """Load the server and write the results.
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hs:l:c:d:w:e:o:')
+    except getopt.GetoptError:
+        usage(2)
+    path = ''
+    numSessions = 0
+    numClients = 8
+    runTime = 10.0
+    warmTime = 1.0
+    cmds = defaultCmds
+    outPath = ''
+    for opt, val in opts:
+        if opt == '-h':
+            usage(0)
+        elif opt == '-s':
+            path = val
+        elif opt == '-l':
+            numSessions = int(val)
+        elif opt == '-c':
+            numClients = int(val)
+        elif opt == '-d':
+            runTime = float(val)
+        elif opt == '-w':
+            warmTime = float(val)
+        elif opt == '-e':
+            cmds = val
+        elif opt == '-o':
+            outPath = val
+    if args or numClients < 1:
+        usage(2)
+    process = None
+    if numSessions:
+        process, path = launchServer(numSessions)
+    elif not path:
+        sys.path.insert(0, benchutil.sourceDir)
+        import calcserver
+        path = calcserver.defaultPath()
+    try:
+        times, numErrors, elapsed = asyncio.run(runLoad(path, cmds,
+                                                        numClients, warmTime,
+                                                        runTime))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    if not times:
+        print('Error - no requests completed')
+        sys.exit(1)
+    benchutil.writeResults({'meta': benchutil.metadata(),
+                            'results': {'cmds': cmds,
+                                        'connections': numClients,
+                                        'sessions': numSessions or None,
+                                        'requests': len(times),
+                                        'errors': numErrors,
+                                        'requestsPerSec': len(times) /
+                                                          elapsed,
+                                        'latency':
+                                        benchutil.summarize(times)}},
+                           outPath)
+
+
+if __name__ == '__main__':
+    main()
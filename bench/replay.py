@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# replay.py, runs recorded session traces through the calculator core
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import getopt
+import benchutil
+
+benchutil.setupPaths()
+
+import calccore
+import sessiontrace
+
+def usage(exitCode=2):
+    """Display usage info and exit.
+    """
+    print('Usage:')
+    print('    python replay.py [-h] [-t] [-s speed] [-r repeats] [-o file]')
+    print('                     tracefile ...')
+    print('where:')
+    print('    -h          display this help message')
+    print('    -t          keep the recorded timing instead of running at '
+          'full speed')
+    print('    -s speed    timing speed up factor with -t [default: 1.0]')
+    print('    -r repeats  number of times to run each trace [default: 10]')
+    print('    -o file     JSON output file [default: stdout]')
+    sys.exit(exitCode)
+
+def main():
+    """Replay the traces and write the results.
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hts:r:o:')
+    except getopt.GetoptError:
+        usage(2)
+    realTime = False
+    speed = 1.0
+    repeats = 10
+    outPath = ''
+    for opt, val in opts:
+        if opt == '-h':
+            usage(0)
+        elif opt == '-t':
+            realTime = True
+        elif opt == '-s':
+            speed = float(val)
+        elif opt == '-r':
+            repeats = int(val)
+        elif opt == '-o':
+            outPath = val
+    if not args:
+        usage(2)
+    results = []
+    for path in args:
+        trace = sessiontrace.SessionTrace(path)
+        numCmds = trace.commandCount()
+        times = [trace.replay(calccore.CalcCore(), realTime, speed)
+                 for i in range(repeats)]
+        results.append({'trace': path, 'commands': numCmds,
+                        'realTime': realTime,
+                        'time': benchutil.summarize(times),
+                        'commandsPerSec': numCmds * len(times) / sum(times)})
+    benchutil.writeResults({'meta': benchutil.metadata(),
+                            'results': results}, outPath)
+
+
+if __name__ == '__main__':
+    main()
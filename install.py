@@ -223,6 +223,9 @@ def main():
         print('  Copying python files to {0}'.format(pythonBuildDir))
         removeDir(pythonBuildDir)         # remove old?
         copyDir('source', pythonBuildDir)
+        if os.path.isdir(os.path.join('source', 'plugins')):
+            copyDir(os.path.join('source', 'plugins'),
+                    os.path.join(pythonBuildDir, 'plugins'))
     if os.path.isdir('doc'):
         docPrefixDir = docDir.replace('<prefix>/', '')
         if not os.path.isabs(docPrefixDir):
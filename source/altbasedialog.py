@@ -27,6 +27,7 @@ class AltBaseDialog(QWidget):
         QWidget.__init__(self, parent)
         self.dlgRef = dlgRef
         self.prevBase = None   # revert to prevBase after temp base change
+        self.valueChanged = True
         self.setAttribute(Qt.WA_QuitOnClose, False)
         self.setWindowTitle('rpCalc Alternate Bases')
         if self.dlgRef.calc.option.boolData('KeepOnTop'):
@@ -78,18 +79,28 @@ class AltBaseDialog(QWidget):
         closeButton.clicked.connect(self.close)
         self.changeBase(self.dlgRef.calc.base, False)
         self.updateOptions()
+        self.dlgRef.calc.addListener(self.calcChanged)
         option = self.dlgRef.calc.option
         self.move(option.intData('AltBaseXPos', 0, 10000),
                   option.intData('AltBaseYPos', 0, 10000))
 
+    def calcChanged(self, event, data):
+        """Note changes to X or the options from the calculator core.
+        """
+        if (event == calccore.Event.regChange and data == 0) or \
+                event == calccore.Event.optChange:
+            self.valueChanged = True
+
     def updateData(self):
-        """Update edit box contents for current registers.
+        """Update edit box contents if the X register changed.
         """
         if self.prevBase and self.dlgRef.calc.flag != calccore.Mode.entryMode:
             self.changeBase(self.prevBase, False)
             self.prevBase = None
-        for box in self.baseBoxes.values():
-            box.setValue(self.dlgRef.calc.stack[0])
+        if self.valueChanged:
+            for box in self.baseBoxes.values():
+                box.setValue(self.dlgRef.calc.stack[0])
+            self.valueChanged = False
 
     def changeBase(self, base, endEntryMode=True):
         """Change core's base, button depression and label highlighting.
@@ -97,10 +108,7 @@ class AltBaseDialog(QWidget):
         self.baseBoxes[self.dlgRef.calc.base].setHighlight(False)
         self.baseBoxes[base].setHighlight(True)
         self.buttons.button(base).setChecked(True)
-        if endEntryMode and self.dlgRef.calc.base != base and \
-                self.dlgRef.calc.flag == calccore.Mode.entryMode:
-            self.dlgRef.calc.flag = calccore.Mode.saveMode
-        self.dlgRef.calc.base = base
+        self.dlgRef.calc.setBase(base, endEntryMode)
 
     def setCodedBase(self, baseCode, temp=True):
         """Set new base from letter code, temporarily if temp is true.
@@ -167,7 +175,9 @@ class AltBaseBox(QLabel):
     def setValue(self, num):
         """Set value to num in proper base.
         """
-        self.setText(self.calcRef.numberStr(num, self.base))
+        text = self.calcRef.numberStr(num, self.base)
+        if text != self.text():
+            self.setText(text)
 
     def setHighlight(self, turnOn=True):
         """Make border bolder if turnOn is true, restore if false.
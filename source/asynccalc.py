@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# asynccalc.py, runs a calculator core on its own thread with an asyncio API
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import queue
+import asyncio
+import threading
+import concurrent.futures
+from calccore import CalcCore
+
+
+class CalcState:
+    """Read-only snapshot of a core's registers, taken between commands.
+    """
+    __slots__ = ('version', 'stack', 'mem', 'xStr', 'flag', 'base',
+                 'history')
+    def __init__(self, calc, version):
+        self.version = version    # increases with each changed state
+        self.stack = tuple(calc.stack)
+        self.mem = tuple(calc.mem)
+        self.xStr = calc.xStr
+        self.flag = calc.flag
+        self.base = calc.base
+        self.history = tuple(calc.history)
+
+    def __repr__(self):
+        return 'CalcState(version={0}, stack={1})'.format(self.version,
+                                                          self.stack)
+
+
+class CmdResult:
+    """The state after a command and its error, (position, token) or None.
+    """
+    __slots__ = ('state', 'error')
+    def __init__(self, state, error):
+        self.state = state
+        self.error = error
+
+
+class Subscription:
+    """Async iterator of the states published after changes.
+
+    If the reader falls behind, older states are dropped so the latest is
+    always kept.  Iteration stops after close() or when the actor closes.
+    """
+    def __init__(self, actor, maxSize):
+        self.actor = actor
+        self.loop = asyncio.get_running_loop()
+        self.maxSize = maxSize
+        # one extra place for the end marker, so the latest state is kept
+        self.queue = asyncio.Queue(maxSize + 1 if maxSize > 0 else 0)
+        self.closed = False
+        self.ended = False
+
+    def put(self, state):
+        """Add a state, dropping the oldest if full.  Runs on the loop.
+
+        A state of None ends the iteration after the queued states.
+        """
+        if self.closed:
+            return
+        if state is None:
+            self.closed = True
+        elif 0 < self.maxSize <= self.queue.qsize():
+            self.queue.get_nowait()
+        self.queue.put_nowait(state)
+
+    def close(self):
+        """Stop receiving states and end the iteration.  Runs on the loop.
+        """
+        self.actor.unsubscribe(self)
+        self.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.ended:
+            state = await self.queue.get()
+            if state is not None:
+                return state
+            self.ended = True
+        raise StopAsyncIteration
+
+
+class CalcActor:
+    """Owns a CalcCore and runs all access to it on a single thread.
+
+    Jobs are functions of the core, run in the order submitted, so no
+    locking is needed in the core and clients only see complete states.
+    The async methods can be used from any event loop, and run() can be
+    used from other threads.  Jobs submitted after close() fail with a
+    RuntimeError.
+    """
+    def __init__(self, calc=None, maxQueue=0):
+        self.calc = calc if calc else CalcCore()
+        self.jobs = queue.Queue(maxQueue)
+        self.jobLock = threading.Lock()    # orders jobs with the close
+        self.closed = False
+        self.subscribers = []
+        self.subscriberLock = threading.Lock()
+        self.version = 0
+        self.changed = False
+        self.calc.addListener(self.calcChanged)
+        self.state = CalcState(self.calc, self.version)
+        self.thread = threading.Thread(target=self.runJobs, daemon=True)
+        self.thread.start()
+
+    def calcChanged(self, event, data):
+        """Note a change event from the core.  Runs on the actor thread.
+        """
+        self.changed = True
+
+    def runJobs(self):
+        """Run queued jobs until closed.  Runs on the actor thread.
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            func, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(self.calc)
+            except Exception as err:
+                future.set_exception(err)
+            else:
+                future.set_result(result)
+            self.updateState()
+
+    def updateState(self):
+        """Take and publish a new snapshot if the core changed.
+
+        Runs on the actor thread.
+        """
+        if self.changed or self.calc.xStr != self.state.xStr or \
+                self.calc.flag != self.state.flag:
+            self.changed = False
+            self.version += 1
+            self.state = CalcState(self.calc, self.version)
+            self.publish(self.state)
+
+    def publish(self, state):
+        """Send a state to the subscribers on their event loops.
+        """
+        with self.subscriberLock:
+            subscribers = self.subscribers[:]
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put,
+                                                       state)
+            except RuntimeError:     # the loop was closed
+                self.unsubscribe(subscription)
+
+    def run(self, func):
+        """Queue func(calc) and return a concurrent.futures.Future.
+
+        The future's result is func's return value.
+        """
+        future = concurrent.futures.Future()
+        with self.jobLock:
+            if not self.closed:
+                self.jobs.put((func, future))
+                return future
+        future.set_exception(RuntimeError('the calculator actor is closed'))
+        return future
+
+    async def call(self, func):
+        """Run func(calc) on the actor thread and return its result.
+        """
+        return await asyncio.wrap_future(self.run(func))
+
+    async def submit(self, text):
+        """Run a string of numbers and commands, return a CmdResult.
+        """
+        def bulkCmd(calc):
+            error = calc.bulkCmd(text)
+            self.updateState()
+            return CmdResult(self.state, error)
+        return await self.call(bulkCmd)
+
+    async def snapshot(self):
+        """Return the state after all previously submitted jobs.
+        """
+        return await self.call(lambda calc: self.state)
+
+    def subscribe(self, maxSize=100):
+        """Return a Subscription to states published after changes.
+
+        Must be called from a coroutine on the event loop that will read it.
+        """
+        subscription = Subscription(self, maxSize)
+        with self.subscriberLock:
+            if not self.closed:
+                self.subscribers.append(subscription)
+                return subscription
+        subscription.put(None)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop publishing to a subscription.
+        """
+        with self.subscriberLock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+
+    def close(self):
+        """Stop the actor thread after the queued jobs finish.
+
+        Open subscriptions end after the states already published.  Later
+        calls do nothing.
+        """
+        with self.jobLock:
+            if self.closed:
+                return
+            self.closed = True
+            self.jobs.put(None)
+        self.thread.join()
+        self.calc.removeListener(self.calcChanged)
+        with self.subscriberLock:
+            subscribers = self.subscribers[:]
+            self.subscribers = []
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, None)
+            except RuntimeError:     # the loop was closed
+                pass
@@ -12,10 +12,21 @@
 # but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
 #*****************************************************************************
 
+import sys
+import os.path
 import math
+import re
 import option
 import optiondefaults
 import calcstack
+import calcstats
+import dataimport
+import calcprofile
+import sessiontrace
+import userfunc
+import cmdtrie
+import pluginreg
+import exprparse
 
 class Mode:
     """Enum for calculator modes.
@@ -30,6 +41,16 @@ class Mode:
     errorMode = 107  # error notification - any cmd to resume
 
 
+class Event:
+    """Enum for change notifications sent to listeners with a data value.
+    """
+    regChange = 200  # register changed - data is index (0 for X)
+    memChange = 201  # memory register changed - data is index
+    histAdd = 202    # history entry appended - data is new index
+    histDel = 203    # oldest history entries removed - data is count
+    optChange = 204  # option changed - data is key, None if unknown
+
+
 class CalcCore:
     """Reverse Polish calculator functionality.
     """
@@ -37,10 +58,41 @@ class CalcCore:
     maxMaxHist = 10000
     minNumBits = 4
     maxNumBits = 128
-    def __init__(self):
+    # commands without buttons, only available as typed commands
+    typedCmdList = ['S+', 'S-', 'SCLR', 'MEAN', 'SDEV', 'SUM', 'LR', 'CORR',
+                    'YEST', 'MED', 'PCTL', 'IQR', 'DGET', 'DLEN']
+    # commands handled by execCmd
+    builtinCmdList = ['ENT', 'EXP', 'X<>Y', 'CHS', 'CLR', '<-', 'STO', 'RCL',
+                      'PLCS', 'SCI', 'DEG', 'R<', 'R>', 'PI', 'X^2', 'Y^X',
+                      'XRT', 'RCIP', 'E^X', 'TN^X', 'SQRT', 'SIN', 'COS',
+                      'TAN', 'LN', 'ASIN', 'ACOS', 'ATAN', 'LOG'] + \
+                     typedCmdList
+    # typed commands handled by the dialog
+    dialogCmdList = ['IMPORT', 'PASTE', 'MREC', 'MEND', 'SWEEP', 'SOLVE',
+                     'INTG', 'DERIV', 'MONTE']
+    # dialog commands with buttons, not recorded in macros
+    dialogButtonCmdList = ['OPT', 'SHOW', 'EXIT']
+    # user functions and plugins can't match or prefix any of these
+    reservedCmdList = builtinCmdList + dialogCmdList + dialogButtonCmdList
+    minQuantileSize = 20
+    maxQuantileSize = 1000
+    minSolveIter = 10
+    maxSolveIter = 10000
+    minSolveTolerance = 1e-15
+    maxSolveTolerance = 1e-3
+    minRandomBatch = 1000
+    maxRandomBatch = 10000000
+    macroPrefix = 'Macro'    # option key prefix for stored macros
+    def __init__(self, sharedOption=None):
         self.stack = calcstack.CalcStack()
-        self.option = option.Option('rpcalc', 20)
-        self.option.loadAll(optiondefaults.defaultList)
+        self.typedCmds = CalcCore.typedCmdList[:]
+        self.stat = calcstats.StatRegister()
+        self.dataReg = dataimport.DataRegister()
+        if sharedOption:    # share settings already loaded by another core
+            self.option = sharedOption.sessionCopy()
+        else:
+            self.option = option.Option('rpcalc', 20)
+            self.option.loadAll(optiondefaults.defaultList)
         self.restoreStack()
         self.xStr = ''
         self.updateXStr()
@@ -49,8 +101,49 @@ class CalcCore:
         self.numBits = 0
         self.useTwosComplement = False
         self.history = []
-        self.histChg = 0
+        self.listeners = []
+        self.macros = {}
+        self.activeMacros = set()
+        self.batchLevel = 0    # history is added once for batched commands
+        self.userFuncs = {}
+        self.plugins = pluginreg.registry
         self.setAltBaseOptions()
+        self.setStatOptions()
+        self.loadMacros()
+        self.loadUserFunctions()
+        self.loadPlugins()
+        calcprofile.profiler.instrumentCore(self)
+        calcprofile.allocProfiler.instrumentCore(self)
+        sessiontrace.recorder.recordCore(self)
+
+    def addListener(self, func):
+        """Register func(event, data) to be called for Event changes.
+        """
+        self.listeners.append(func)
+
+    def removeListener(self, func):
+        """Stop sending change events to func.
+        """
+        self.listeners.remove(func)
+
+    def notify(self, event, data=None):
+        """Send a change event to all listeners.
+        """
+        for func in self.listeners:
+            func(event, data)
+
+    def notifyStack(self, prevStack):
+        """Send events for any registers that differ from prevStack.
+        """
+        if self.listeners:
+            for i, (prevNum, num) in enumerate(zip(prevStack, self.stack)):
+                if prevNum != num:
+                    self.notify(Event.regChange, i)
+
+    def optionsChanged(self, key=None):
+        """Notify listeners of an option change made outside of commands.
+        """
+        self.notify(Event.optChange, key)
 
     def setAltBaseOptions(self):
         """Update bit limit and two's complement use.
@@ -61,6 +154,147 @@ class CalcCore:
             self.numBits = CalcCore.maxNumBits
         self.useTwosComplement = self.option.boolData('UseTwosComplement')
 
+    def setBase(self, base, endEntryMode=True):
+        """Change the number base, ending number entry if endEntryMode.
+        """
+        if endEntryMode and base != self.base and \
+                self.flag == Mode.entryMode:
+            self.flag = Mode.saveMode
+        self.base = base
+
+    def setStatOptions(self):
+        """Update the quantile sketch accuracy.
+        """
+        self.stat.setCompression(self.option.
+                                 intData('QuantileSketchSize',
+                                         CalcCore.minQuantileSize,
+                                         CalcCore.maxQuantileSize) or 200)
+
+    def loadMacros(self):
+        """Compile the macros stored in the options.
+        """
+        prefixLen = len(CalcCore.macroPrefix)
+        for data in reversed(self.option.dictList):   # overrides are last
+            for key, text in list(data.items()):
+                if key.startswith(CalcCore.macroPrefix) and \
+                        len(key) > prefixLen:
+                    self.defineMacro(key[prefixLen:], text, False)
+
+    def defineMacro(self, name, text, store=True):
+        """Add or replace a typed command that runs the tokens in text.
+
+        The macro is saved in the option file if store is true.
+        """
+        self.macros[name] = self.compileTokens(text)
+        if name not in self.typedCmds:
+            self.typedCmds.append(name)
+        if store:
+            self.option.addData(CalcCore.macroPrefix + name, text, True)
+            self.option.writeChanges()
+
+    def loadUserFunctions(self):
+        """Read the user function file and add its commands.
+
+        RPN functions run like macros and Python functions are called from
+        execCmd.
+        """
+        path = (self.option.strData('UserFunctionFile', True) or
+                userfunc.defaultPath(self.option.path))
+        if not path or not os.path.exists(path):
+            return
+        library = userfunc.FunctionLibrary(path, CalcCore.reservedCmdList +
+                                           self.typedCmds)
+        library.load(self.compileTokens)
+        for error in library.errors:
+            print('Error - function file {0}, {1}'.format(path, error))
+        self.macros.update(library.rpnFuncs)
+        self.userFuncs.update(library.pyFuncs)
+        for name in list(library.rpnFuncs) + list(library.pyFuncs):
+            if name not in self.typedCmds:
+                self.typedCmds.append(name)
+
+    def loadPlugins(self):
+        """Add the command names from plugins without importing them.
+
+        Macros and user functions replace plugin commands with the same
+        name, and plugin names that are a prefix conflict with them are
+        skipped.
+        """
+        self.plugins.scan([pluginreg.builtinDir,
+                           pluginreg.userDir(self.option.path)],
+                          CalcCore.reservedCmdList)
+        for name in self.plugins.commands:
+            if name in self.typedCmds:
+                continue
+            conflict = cmdtrie.conflictingName(name, self.typedCmds)
+            if conflict:
+                print('Error - plugin command {0} conflicts with the {1} '
+                      'command'.format(name, conflict))
+                continue
+            self.typedCmds.append(name)
+
+    def macroCmd(self, name):
+        """Run a macro's tokens as one command with one history entry.
+        """
+        if name in self.activeMacros:    # recursive macro
+            raise ValueError
+        eqn = '{0}({1})'.format(name, self.formatNum(self.stack[0]))
+        self.activeMacros.add(name)
+        self.batchLevel += 1
+        try:
+            error = self.execOps(self.macros[name])
+        finally:
+            self.activeMacros.discard(name)
+            self.batchLevel -= 1
+        if error:
+            if self.flag != Mode.errorMode:    # unknown command
+                self.xStr = 'error 0'
+                self.flag = Mode.errorMode
+        elif not self.batchLevel:
+            self.addHistory(eqn, self.stack[0])
+        return True
+
+    def exprCmd(self, text):
+        """Evaluate an algebraic expression, pushing the result.
+
+        Numbers in the expression are decimal in any base.  Adds one
+        history entry for the expression.  Returns None if successful, or
+        the position and text of the first error.
+        """
+        try:
+            ops = exprparse.compileExpr(text)
+        except exprparse.ExprError as err:
+            return (err.pos, str(err))
+        self.batchLevel += 1
+        try:
+            error = self.runOps(ops, True)
+        finally:
+            self.batchLevel -= 1
+        if not error and not self.batchLevel:
+            self.addHistory(text.strip(), self.stack[0])
+        return error
+
+    def importData(self, importer, keepData=False, progressFunc=None):
+        """Add a column from a DataImporter to the statistics registers.
+
+        Also stores the column in the data register if keepData is true.
+        Returns the number of values read.
+        """
+        count = 0
+        if keepData:
+            self.dataReg = dataimport.DataRegister()
+            mappedData = importer.dataArray()
+            if mappedData is not None:
+                self.dataReg.setArray(mappedData)
+                keepData = False
+        for values in importer.chunks(progressFunc):
+            self.stat.addValues(values)
+            if keepData:
+                self.dataReg.extend(values)
+            count += len(values)
+        self.dataReg.finish()
+        return count
+
     def restoreStack(self):
         """Read stack from option file.
         """
@@ -148,11 +382,90 @@ class CalcCore:
     def newXValue(self, value):
         """Push X onto stack, replace with value.
         """
+        prevStack = self.stack[:]
         self.stack.enterX()
         self.stack[0] = float(value)
         self.updateXStr()
         self.flag = Mode.saveMode
+        self.notifyStack(prevStack)
         
+    def applyResults(self, eqn, values):
+        """Replace registers from X up with values, adding a history entry.
+
+        Used for results calculated outside of commands, such as by the
+        solver.
+        """
+        prevStack = self.stack[:]
+        self.stack[:len(values)] = [float(value) for value in values]
+        self.updateXStr()
+        self.flag = Mode.saveMode
+        self.addHistory(eqn, self.stack[0])
+        self.notifyStack(prevStack)
+
+    def scratchCopy(self):
+        """Return a core with copies of the registers and settings.
+
+        Commands can run on the copy away from the GUI thread, then
+        applyScratch copies the results back.  The statistics, data
+        register and option changes are copies too, so the core is not
+        changed if the results are dropped.  Methods replaced on this
+        instance (for profiling or recording) are not copied.
+        """
+        scratch = CalcCore.__new__(CalcCore)
+        scratch.__dict__.update((key, value) for key, value in
+                                self.__dict__.items() if not callable(value))
+        scratch.stack = calcstack.CalcStack(self.stack)
+        scratch.mem = self.mem[:]
+        scratch.stat = self.stat.copy()
+        scratch.dataReg = self.dataReg.copy()
+        scratch.option = self.option.sessionCopy()
+        scratch.history = []
+        scratch.listeners = []
+        scratch.activeMacros = set()
+        return scratch
+
+    def applyScratch(self, scratch, cmdStr=''):
+        """Copy registers, settings and new history from a scratchCopy.
+
+        cmdStr is the command that ran on the copy.
+        """
+        prevStack = self.stack[:]
+        self.stat = scratch.stat
+        self.dataReg = scratch.dataReg
+        changedKeys = [key for key, value in scratch.option.userDict.items()
+                       if self.option.changeData(key, value, True)]
+        if changedKeys:
+            self.option.writeChanges()
+            for key in changedKeys:
+                self.notify(Event.optChange, key)
+        self.stack.replaceAll(scratch.stack)
+        for i, num in enumerate(scratch.mem):
+            if num != self.mem[i]:
+                self.mem[i] = num
+                self.notify(Event.memChange, i)
+        self.flag = scratch.flag
+        self.xStr = scratch.xStr
+        for eqn, value in scratch.history:
+            self.addHistory(eqn, value)
+        self.notifyStack(prevStack)
+
+    def solveSettings(self):
+        """Return the solver tolerance and iteration limit from options.
+        """
+        return (self.option.numData('SolveTolerance',
+                                    CalcCore.minSolveTolerance,
+                                    CalcCore.maxSolveTolerance),
+                self.option.intData('SolveMaxIter', CalcCore.minSolveIter,
+                                    CalcCore.maxSolveIter))
+
+    def enterXY(self, xValue, yValue):
+        """Push two results onto stack, xValue into X and yValue into Y.
+        """
+        self.stack.enterX()
+        self.stack[0] = yValue
+        self.stack.enterX()
+        self.stack[0] = xValue
+
     def numEntry(self, entStr):
         """Interpret a digit entered depending on mode.
         """
@@ -181,6 +494,78 @@ class CalcCore:
             self.flag = Mode.entryMode
         return True
 
+    def compileTokens(self, text):
+        """Split text into a list of (position, token, number) entries.
+
+        Tokens are separated by white space, commas or semicolons.  The
+        number is the decimal value of numeric tokens and None otherwise.
+        """
+        ops = []
+        for match in re.finditer(r'[^\s,;]+', text):
+            token = match.group()
+            try:
+                num = float(token)
+                if not math.isfinite(num):
+                    num = None
+            except ValueError:
+                num = None
+            ops.append((match.start(), token, num))
+        return ops
+
+    def runOps(self, ops, decimalNums=False):
+        """Execute a list of compiled tokens without display updates.
+
+        Numbers push onto the stack and other tokens are run as commands.
+        Number tokens are read in the current base unless decimalNums is
+        true.  Returns None if successful, or the position and token of
+        the first error.
+        """
+        prevStack = self.stack[:]
+        error = self.execOps(ops, decimalNums)
+        self.notifyStack(prevStack)
+        return error
+
+    def execOps(self, ops, decimalNums=False):
+        """Run compiled tokens without register change events.
+        """
+        if self.flag == Mode.errorMode:
+            self.flag = Mode.saveMode
+        error = None
+        for pos, token, num in ops:
+            if self.flag in (Mode.memStoMode, Mode.memRclMode,
+                             Mode.decPlcMode):
+                if not self.memStoRcl(token):
+                    self.flag = Mode.saveMode
+                    error = (pos, token)
+                    break
+                continue
+            if self.base != 10 and not decimalNums:
+                try:
+                    num = self.convertNum(token)
+                except ValueError:
+                    if self.flag == Mode.errorMode:   # too many bits
+                        error = (pos, token)
+                        break
+                    num = None
+            if num is not None:
+                if self.flag != Mode.replMode:
+                    self.stack.enterX()
+                self.stack[0] = num
+                self.flag = Mode.saveMode
+                continue
+            cmdStr = token.upper()
+            if not self.execCmd(cmdStr) or self.flag == Mode.errorMode:
+                error = (pos, token)
+                break
+        if self.flag in (Mode.entryMode, Mode.saveMode, Mode.replMode):
+            self.updateXStr()
+        return error
+
+    def bulkCmd(self, text):
+        """Execute a string of numbers and commands, return error or None.
+        """
+        return self.runOps(self.compileTokens(text))
+
     def numberStr(self, number, base):
         """Return string of number in given base (2-16).
         """
@@ -268,6 +653,9 @@ class CalcCore:
 
     def chsCmd(self):
         """Change sign command.
+
+        Edits the string being entered, otherwise negates the full
+        precision X value.
         """
         if self.flag == Mode.expMode:
             numExp = self.xStr.split('e', 1)
@@ -275,11 +663,15 @@ class CalcCore:
                 self.xStr = numExp[0] + 'e-' + numExp[1][1:]
             else:
                 self.xStr = numExp[0] + 'e+' + numExp[1][1:]
-        else:
+        elif self.flag == Mode.entryMode:
             if self.xStr[0] == ' ':
                 self.xStr = '-' + self.xStr[1:]
             else:
                 self.xStr = ' ' + self.xStr[1:]
+        else:
+            self.stack[0] = -self.stack[0]
+            self.updateXStr()
+            return True
         self.stack[0] = float(self.xStr.replace(' ', ''))
         return True
 
@@ -289,12 +681,15 @@ class CalcCore:
         if len(numStr) == 1 and '0' <= numStr <= '9':
             num = int(numStr)
             if self.flag == Mode.memStoMode:
-                self.mem[num] = self.stack[0]
+                if self.mem[num] != self.stack[0]:
+                    self.mem[num] = self.stack[0]
+                    self.notify(Event.memChange, num)
             elif self.flag == Mode.memRclMode:
                 self.stack.enterX()
                 self.stack[0] = self.mem[num]
             else:        # decimal place mode
-                self.option.changeData('NumDecimalPlaces', numStr, 1)
+                if self.option.changeData('NumDecimalPlaces', numStr, 1):
+                    self.notify(Event.optChange, 'NumDecimalPlaces')
                 self.option.writeChanges()
         elif numStr == '<-':         # backspace
             pass
@@ -316,6 +711,16 @@ class CalcCore:
 
     def cmd(self, cmdStr):
         """Main command interpreter - returns true/false if change made.
+
+        Sends change events for any registers modified.
+        """
+        prevStack = self.stack[:]
+        result = self.execCmd(cmdStr)
+        self.notifyStack(prevStack)
+        return result
+
+    def execCmd(self, cmdStr):
+        """Run a command without register change events.
         """
         if self.flag in (Mode.memStoMode, Mode.memRclMode, Mode.decPlcMode):
             return self.memStoRcl(cmdStr)
@@ -376,11 +781,13 @@ class CalcCore:
                 new = orig and 'no' or 'yes'
                 self.option.changeData('ForceSciNotation', new, 1)
                 self.option.writeChanges
+                self.notify(Event.optChange, 'ForceSciNotation')
             elif cmdStr == 'DEG':           # change deg/rad setting
                 orig = self.option.strData('AngleUnit')
                 new = orig == 'deg' and 'rad' or 'deg'
                 self.option.changeData('AngleUnit', new, 1)
                 self.option.writeChanges()
+                self.notify(Event.optChange, 'AngleUnit')
             elif cmdStr == 'R<':           # roll stack back
                 self.stack.rollBack()
             elif cmdStr == 'R>':           # roll stack forward
@@ -388,6 +795,55 @@ class CalcCore:
             elif cmdStr == 'PI':           # pi constant
                 self.stack.enterX()
                 self.stack[0] = math.pi
+            elif cmdStr in ('S+', 'S-'):   # add or remove statistics point
+                if cmdStr == 'S+':
+                    self.stat.addPoint(self.stack[0], self.stack[1])
+                else:
+                    self.stat.removePoint(self.stack[0], self.stack[1])
+                self.stack[0] = float(self.stat.count)
+                self.updateXStr()
+                self.flag = Mode.replMode   # next entry replaces count
+                return True
+            elif cmdStr == 'SCLR':         # clear statistics registers
+                self.stat.clear()
+            elif cmdStr == 'MEAN':         # x and y means
+                self.enterXY(*self.stat.means())
+            elif cmdStr == 'SDEV':         # x and y sample std deviations
+                self.enterXY(*self.stat.stdDevs())
+            elif cmdStr == 'SUM':          # x and y totals
+                self.enterXY(self.stat.sumX.total, self.stat.sumY.total)
+            elif cmdStr == 'LR':           # linear regression
+                self.enterXY(*self.stat.linReg())
+            elif cmdStr == 'CORR':         # correlation coefficient
+                self.stack.enterX()
+                self.stack[0] = self.stat.correlation()
+            elif cmdStr == 'YEST':         # linear estimate of y from x
+                eqn = 'yest({0})'.format(self.formatNum(self.stack[0]))
+                self.stack[0] = self.stat.estimateY(self.stack[0])
+            elif cmdStr == 'MED':          # median of x data
+                self.stack.enterX()
+                self.stack[0] = self.stat.quantile(0.5)
+            elif cmdStr == 'PCTL':         # percentile of x data
+                eqn = 'pctl({0})'.format(self.formatNum(self.stack[0]))
+                self.stack[0] = self.stat.quantile(self.stack[0] / 100.0)
+            elif cmdStr == 'IQR':          # interquartile range of x data
+                self.stack.enterX()
+                self.stack[0] = (self.stat.quantile(0.75) -
+                                 self.stat.quantile(0.25))
+            elif cmdStr == 'DGET':         # get data register value at X
+                try:
+                    self.stack[0] = self.dataReg[int(self.stack[0])]
+                except (IndexError, TypeError):
+                    raise ValueError
+            elif cmdStr == 'DLEN':         # length of data register
+                self.stack.enterX()
+                self.stack[0] = float(len(self.dataReg))
+            elif cmdStr in self.macros:    # recorded macro
+                return self.macroCmd(cmdStr)
+            elif cmdStr in self.userFuncs: # user Python function
+                eqn = self.userFuncs[cmdStr].run(self)
+            elif cmdStr in self.plugins.commands:   # plugin command
+                eqn = self.plugins.run(cmdStr, self)
             elif cmdStr == 'X^2':          # square
                 eqn = '{0}^2'.format(self.formatNum(self.stack[0]))
                 self.stack[0] = self.stack[0] * self.stack[0]
@@ -438,14 +894,8 @@ class CalcCore:
                     return False
             self.flag = Mode.saveMode
             self.updateXStr()
-            if eqn:
-                self.history.append((eqn, self.stack[0]))
-                self.histChg += 1
-                maxLen = self.option.intData('MaxHistLength',
-                                             CalcCore.minMaxHist,
-                                             CalcCore.maxMaxHist)
-                while len(self.history) > maxLen:
-                    del self.history[0]
+            if eqn and not self.batchLevel:
+                self.addHistory(eqn, self.stack[0])
             return True
         except (ValueError, ZeroDivisionError):
             self.xStr = 'error 0'
@@ -456,6 +906,18 @@ class CalcCore:
             self.flag = Mode.errorMode
             return True
 
+    def addHistory(self, eqn, value):
+        """Append an equation and result to the history list.
+        """
+        self.history.append((eqn, value))
+        self.notify(Event.histAdd, len(self.history) - 1)
+        maxLen = self.option.intData('MaxHistLength', CalcCore.minMaxHist,
+                                     CalcCore.maxMaxHist)
+        if len(self.history) > maxLen:
+            numDel = len(self.history) - maxLen
+            del self.history[:numDel]
+            self.notify(Event.histDel, numDel)
+
     def printDebug(self):
         """Print display string and all registers for debug.
         """
@@ -463,17 +925,49 @@ class CalcCore:
         print('\n'.join([repr(num) for num in self.stack]))
 
 
+def runChecks():
+    """Assert that pasted commands and expressions give exact results.
+    """
+    calc = CalcCore()
+    for text, result in (('123456789 CHS', -123456789.0),
+                         ('1 3 / CHS', -1 / 3),
+                         ('0.1 CHS CHS 3 *', 0.1 * 3)):
+        calc.stack.replaceAll([0.0] * 4)
+        calc.flag = Mode.saveMode
+        assert calc.bulkCmd(text) is None, text
+        assert calc.stack[0] == result, (text, calc.stack[0])
+    calc.setBase(16)
+    for text, result in (('10+1', 11.0), ('2*pi', 2 * math.pi)):
+        calc.stack.replaceAll([0.0] * 4)
+        assert calc.exprCmd(text) is None, text
+        assert calc.stack[:2] == [result, 0.0], (text, calc.stack)
+    calc.setBase(10)
+    print('All checks passed')
+
+
 if __name__ == '__main__':
+    if '--check' in sys.argv:
+        runChecks()
+        sys.exit(0)
+    for arg in sys.argv[1:]:
+        if arg == '--profile' or arg.startswith('--profile='):
+            calcprofile.profiler.enable(arg.partition('=')[2] or
+                                        'rpcalc-profile.json')
+        elif arg == '--allocs' or arg.startswith('--allocs='):
+            calcprofile.allocProfiler.enable(arg.partition('=')[2] or
+                                             'rpcalc-allocs.json')
     calc = CalcCore()
     calc.printDebug()
     while 1:
         ans = input('Entry->')
-        if ans in ('ENT', 'X<>Y', 'CHS', 'CLR', '<-', 'X^2', 'SQRT', 'Y^X',
-                   'XRT', 'RCIP', 'SIN', 'COS', 'TAN', 'LN', 'E^X', 'ASIN',
-                   'ACOS', 'ATAN', 'LOG', 'TN^X', 'STO', 'RCL', 'R<', 'R>',
-                   'PI'):
+        if ans in CalcCore.builtinCmdList or ans in calc.typedCmds:
             calc.cmd(ans)
             calc.printDebug()
+        elif ' ' in ans.strip():
+            error = calc.bulkCmd(ans)
+            if error:
+                print('error at position', error[0] + 1, ':', error[1])
+            calc.printDebug()
         else:
             for ch in ans:
                 if ch == 'e':
@@ -14,12 +14,14 @@
 
 import sys
 import os.path
+import time
 from PyQt5.QtCore import (QPoint, QRect, QTimer, Qt)
-from PyQt5.QtGui import (QColor, QPalette)
-from PyQt5.QtWidgets import (QApplication, QDialog, QFrame, QGridLayout,
-                             QHBoxLayout, QLCDNumber, QLabel, QMenu,
-                             QMessageBox, QSizePolicy, QVBoxLayout, QWidget,
-                             qApp)
+from PyQt5.QtGui import (QColor, QKeySequence, QPalette)
+from PyQt5.QtWidgets import (QApplication, QDialog, QFileDialog, QFrame,
+                             QGridLayout, QHBoxLayout, QInputDialog,
+                             QLCDNumber, QLabel, QMenu, QMessageBox,
+                             QProgressDialog, QSizePolicy, QVBoxLayout,
+                             QWidget, qApp)
 try:
     from __main__ import __version__, __author__, helpFilePath, iconPath
 except ImportError:
@@ -29,16 +31,27 @@ except ImportError:
 from calccore import CalcCore, Mode
 from calclcd import Lcd, LcdBox
 from calcbutton import CalcButton
+import dataimport
+import cmdtrie
 import extradisplay
 import altbasedialog
 import optiondlg
 import icondict
 import helpview
+import latencyhud
+import progcompile
+import calcnumeric
+import calcstats
+import calcworker
 
 
 class CalcDlg(QWidget):
     """Main dialog for calculator program.
     """
+    # typed commands handled by the dialog rather than CalcCore
+    dlgCmdList = CalcCore.dialogCmdList
+    # commands that are not recorded in macros
+    noMacroCmdList = CalcCore.dialogButtonCmdList
     def __init__(self, parent=None):
         QWidget.__init__(self, parent)
         self.calc = CalcCore()
@@ -73,6 +86,14 @@ class CalcDlg(QWidget):
         self.popupMenu.addSeparator()
         self.popupMenu.addAction('Show Other &Bases', self.viewAltBases)
         self.popupMenu.addSeparator()
+        self.popupMenu.addAction('&Paste Commands',
+                                 lambda: self.issueCmd('PASTE'))
+        self.popupMenu.addAction('Start Macro Re&cording',
+                                 lambda: self.issueCmd('MREC'))
+        self.popupMenu.addAction('&End Macro Recording',
+                                 lambda: self.issueCmd('MEND'))
+        self.popupMenu.addAction('Show &Latency', self.toggleLatencyHud)
+        self.popupMenu.addSeparator()
         self.popupMenu.addAction('Show Help &File', self.help)
         self.popupMenu.addAction('&About rpCalc', self.about)
         self.popupMenu.addSeparator()
@@ -82,6 +103,7 @@ class CalcDlg(QWidget):
         topLay.setSpacing(4)
         topLay.setContentsMargins(6, 6, 6, 6)
         lcdBox = LcdBox()
+        self.lcdBox = lcdBox
         topLay.addWidget(lcdBox)
         lcdLay = QGridLayout(lcdBox)
         lcdLay.setColumnStretch(1, 1)
@@ -99,6 +121,16 @@ class CalcDlg(QWidget):
                 w.hide()
         self.lcd = Lcd(2.0, 13)
         lcdLay.addWidget(self.lcd, 3, 0, 1, 2, Qt.AlignRight)
+        # coalesces display updates to at most one per frame
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(16)
+        self.updateTimer.timeout.connect(self.updateLcd)
+        self.latency = latencyhud.monitor
+        self.latencyHud = None
+        self.lcd.paintHook = self.latency.paintDone
+        if self.latency.showHud:
+            self.toggleLatencyHud()
         self.setLcdHighlight()
         self.updateLcd()
         self.updateColors()
@@ -168,6 +200,17 @@ class CalcDlg(QWidget):
 
         self.entryStr = ''
         self.showMode = False
+        self.cmdTrie = cmdtrie.CommandTrie(list(self.cmdDict.keys()) +
+                                           CalcDlg.dlgCmdList)
+        self.numTrieCmds = 0    # number of typedCmds added to the trie
+        self.macroCmds = None    # list of commands while recording a macro
+        self.macroKeys = {}      # function key code to macro name
+        self.worker = calcworker.CalcWorker(self)
+        self.worker.jobFinished.connect(self.workerDone)
+        for num in range(1, 13):
+            name = self.calc.option.userDict.get('KeyF{0}'.format(num))
+            if name in self.calc.typedCmds:
+                self.macroKeys[Qt.Key_F1 + num - 1] = name
 
         statusBox = QFrame()
         statusBox.setFrameStyle(QFrame.Panel | QFrame.Sunken)
@@ -217,9 +260,15 @@ class CalcDlg(QWidget):
                     or 'fix'
         decPlcs = self.calc.option.intData('NumDecimalPlaces', 0, 9)
         angle = self.calc.option.strData('AngleUnit')
-        self.statusLabel.setText('{0} {1}  {2}'.format(numFormat, decPlcs,
-                                                       angle))
-        self.entryLabel.setText(subsText or '> {0}'.format(self.entryStr))
+        recText = '  rec' if self.macroCmds is not None else ''
+        self.statusLabel.setText('{0} {1}  {2}{3}'.format(numFormat, decPlcs,
+                                                          angle, recText))
+        entryText = '> {0}'.format(self.entryStr)
+        prefix = self.entryStr.upper().lstrip(':')
+        if prefix and not prefix.startswith('=') and not subsText:
+            entryText += '   ' + ' '.join(self.commandTrie().
+                                          candidates(prefix))
+        self.entryLabel.setText(subsText or entryText)
 
     def setOptions(self):
         """Starts option dialog, called by option key.
@@ -261,6 +310,20 @@ class CalcDlg(QWidget):
                                True, 4, False, ' bits')
         optiondlg.OptionDlgBool(self.optDlg, 'UseTwosComplement',
                                 'Use two\'s complement\nnegative numbers')
+        self.optDlg.startGroupBox('Statistics', 10)
+        optiondlg.OptionDlgInt(self.optDlg, 'QuantileSketchSize',
+                               'Percentile accuracy', CalcCore.minQuantileSize,
+                               CalcCore.maxQuantileSize, True, 10)
+        self.optDlg.startGroupBox('Numeric Methods', 10)
+        optiondlg.OptionDlgInt(self.optDlg, 'SolveMaxIter', 'Iteration limit',
+                               CalcCore.minSolveIter, CalcCore.maxSolveIter,
+                               True, 10)
+        optiondlg.OptionDlgDbl(self.optDlg, 'SolveTolerance', 'Tolerance',
+                               CalcCore.minSolveTolerance,
+                               CalcCore.maxSolveTolerance)
+        optiondlg.OptionDlgInt(self.optDlg, 'RandomBatchSize',
+                               'Random batch size', CalcCore.minRandomBatch,
+                               CalcCore.maxRandomBatch, True, 10000)
         self.optDlg.startGroupBox('Extra Views', 10)
         optiondlg.OptionDlgPush(self.optDlg, 'View Extra Data', self.viewExtra)
         optiondlg.OptionDlgPush(self.optDlg, 'View Other Bases',
@@ -295,6 +358,8 @@ class CalcDlg(QWidget):
                             win.show()
             if self.altBaseView:
                 self.altBaseView.updateOptions()
+            self.calc.setStatOptions()
+            self.calc.optionsChanged()
             self.setLcdHighlight()
             self.calc.updateXStr()
         self.optDlg = None
@@ -378,6 +443,18 @@ class CalcDlg(QWidget):
                 w.hide()
         self.adjustSize()
         self.calc.updateXStr()
+        self.scheduleUpdate()
+
+    def toggleLatencyHud(self):
+        """Show or hide the key press to display latency overlay.
+        """
+        if not self.latencyHud:
+            self.latency.enable()
+            self.latencyHud = latencyhud.LatencyHud(self.latency, self.lcdBox)
+            self.latency.hud = self.latencyHud
+            self.latencyHud.show()
+        else:
+            self.latencyHud.setVisible(not self.latencyHud.isVisible())
 
     def viewAltBases(self):
         """Show alternate base view.
@@ -430,6 +507,370 @@ class CalcDlg(QWidget):
                                 'rpCalc, Version {0}\n by {1}'.
                                 format(__version__, __author__))
 
+    def importData(self):
+        """Read a data column from a file into the statistics registers.
+        """
+        path, selFilter = QFileDialog.getOpenFileName(self,
+                                    'rpCalc - Import Data', '',
+                                    'Text Data (*.csv *.txt);;'
+                                    'Raw 64-bit Floats (*.f64 *.bin *.dat);;'
+                                    'Raw 32-bit Floats (*.f32);;'
+                                    'All Files (*)')
+        if not path:
+            return
+        fileType = dataimport.DataImporter.typeFromPath(path)
+        numColumns = 1
+        if fileType != 'csv':
+            numColumns, ok = QInputDialog.getInt(self, 'rpCalc',
+                                                 'Values per record', 1, 1,
+                                                 1000)
+            if not ok:
+                return
+        column, ok = QInputDialog.getInt(self, 'rpCalc', 'Column to import',
+                                         1, 1, 1000)
+        if not ok:
+            return
+        keepData = QMessageBox.question(self, 'rpCalc',
+                                        'Also store the values in the data '
+                                        'register?') == QMessageBox.Yes
+        progress = QProgressDialog('Importing data...', 'Cancel', 0, 1000,
+                                   self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def updateProgress(done, total):
+            progress.setValue(1000 * done // total)
+            qApp.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            importer = dataimport.DataImporter(path, column - 1, fileType,
+                                               numColumns)
+            count = self.calc.importData(importer, keepData, updateProgress)
+        except (IOError, OSError, ValueError) as err:
+            progress.close()
+            QMessageBox.warning(self, 'rpCalc',
+                                'Error importing {0}:\n{1}'.format(path,
+                                                                   err))
+            return
+        progress.close()
+        self.calc.newXValue(count)   # show number of values read
+
+    def pasteCmds(self):
+        """Run the numbers and commands from the clipboard as one batch.
+        """
+        error = self.calc.bulkCmd(QApplication.clipboard().text())
+        if error:
+            QApplication.beep()
+            self.updateEntryLabel('Error at character {0}: {1}'.
+                                  format(error[0] + 1, error[1]))
+            QTimer.singleShot(5000, self.updateEntryLabel)
+
+    def startMacro(self):
+        """Start recording commands for a new macro.
+        """
+        self.macroCmds = []
+        self.updateEntryLabel()
+
+    def recordMacroCmd(self, text):
+        """Add a command to the macro being recorded.
+
+        Number entry keys are combined into one number when the entry ends.
+        An empty text ends any number entry.
+        """
+        if self.calc.flag in (Mode.memStoMode, Mode.memRclMode,
+                              Mode.decPlcMode):
+            self.macroCmds.append(text)    # register or places digit
+            return
+        entering = self.calc.flag in (Mode.entryMode, Mode.expMode)
+        if text in ('.', 'EXP') or text.isdigit() or \
+                (self.calc.base == 16 and len(text) == 1 and
+                 'A' <= text <= 'F') or \
+                (entering and text in ('CHS', '<-')):
+            return
+        if entering:
+            if self.calc.base == 10:
+                self.macroCmds.append(repr(self.calc.stack[0]))
+            else:
+                self.macroCmds.append(self.calc.numberStr(self.calc.stack[0],
+                                                          self.calc.base))
+        if text:
+            self.macroCmds.append(text)
+
+    def macroNameError(self, name):
+        """Return a message if name can't be used for a macro, else ''.
+
+        Names can't match the start of other commands, since typed commands
+        run as soon as they match.
+        """
+        if len(name) < 2 or not name.isalnum() or not name[0].isalpha():
+            return ('Macro names must have two or more letters or digits, '
+                    'starting with a letter')
+        conflict = cmdtrie.conflictingName(name, [cmd for cmd in
+                                                  self.cmdNames()
+                                                  if cmd != name])
+        if conflict:
+            return 'Macro name conflicts with the {0} command'.format(conflict)
+        if name in self.cmdNames() and name not in self.calc.macros:
+            return 'Macro name matches an existing command'
+        return ''
+
+    def endMacro(self):
+        """Stop recording and save the commands as a named macro.
+        """
+        if self.macroCmds is None:
+            QApplication.beep()
+            return
+        self.recordMacroCmd('')
+        cmds = self.macroCmds
+        self.macroCmds = None
+        self.updateEntryLabel()
+        if not cmds:
+            return
+        name, ok = QInputDialog.getText(self, 'rpCalc', 'Macro command name')
+        name = name.strip().upper()
+        if not ok or not name:
+            return
+        error = self.macroNameError(name)
+        if error:
+            QMessageBox.warning(self, 'rpCalc', error)
+            return
+        keyNames = ['None'] + ['F{0}'.format(num) for num in range(1, 13)]
+        keyName, ok = QInputDialog.getItem(self, 'rpCalc', 'Shortcut key',
+                                           keyNames, 0, False)
+        self.calc.defineMacro(name, ' '.join(cmds))
+        if ok and keyName != 'None':
+            self.calc.option.addData('Key' + keyName, name, True)
+            self.calc.option.writeChanges()
+            self.macroKeys[Qt.Key_F1 + int(keyName[1:]) - 1] = name
+        self.updateEntryLabel('Macro {0} saved'.format(name))
+        QTimer.singleShot(5000, self.updateEntryLabel)
+
+    def chooseProgram(self, prompt):
+        """Ask for a command to evaluate as a function of X.
+
+        Macros, single parameter user functions and plugin commands can be
+        used.  Returns the name, or an empty string if canceled.
+        """
+        names = sorted(list(self.calc.macros) +
+                       [name for name, func in self.calc.userFuncs.items()
+                        if len(func.params) == 1] +
+                       list(self.calc.plugins.commands))
+        if not names:
+            QMessageBox.warning(self, 'rpCalc', 'Record a macro or define '
+                                'a function first')
+            return ''
+        name, ok = QInputDialog.getItem(self, 'rpCalc', prompt, names, 0,
+                                        False)
+        return name if ok else ''
+
+    def sweepCmd(self):
+        """Tabulate a command from the start in Z to the stop in Y by X.
+
+        Results show in the extra data view.
+        """
+        name = self.chooseProgram('Command to sweep from Z to Y by X')
+        if not name:
+            return
+        start, stop, step = self.calc.stack[2::-1]
+        try:
+            sweep = progcompile.Sweep(self.calc, name, start, stop, step)
+        except ValueError as err:
+            QMessageBox.warning(self, 'rpCalc', str(err))
+            return
+        if self.optDlg:
+            self.optDlg.reject()
+        if not self.extraView:
+            self.extraView = extradisplay.ExtraDisplay(self)
+        self.extraView.showSweep(sweep)
+
+    def startWorker(self, job):
+        """Run a calcworker.Job, showing its text and blocking commands.
+
+        The LCD shows a busy message if the job takes long, and the escape
+        key cancels it.
+        """
+        self.updateEntryLabel(job.text)
+        self.worker.start(job)
+        QTimer.singleShot(200, self.showBusy)
+
+    def showBusy(self):
+        """Show a busy message on the LCD if a job is still running.
+        """
+        if self.worker.busy():
+            self.lcd.setDisplay(' bUSY', self.lcd.digitCount())
+
+    def cancelWorker(self):
+        """Cancel the running job, leaving the calculator unchanged.
+        """
+        if self.worker.cancel():
+            self.updateLcd()
+            self.updateEntryLabel('Canceled')
+            QTimer.singleShot(5000, self.updateEntryLabel)
+
+    def workerDone(self, job):
+        """Apply the result of a finished job, or show its error.
+
+        The result function returns a status message, or it can raise
+        ValueError for results that can't be used.
+        """
+        error = job.error
+        if not error:
+            try:
+                self.updateEntryLabel(job.resultFunc(job.result))
+            except ValueError as err:
+                error = err
+        self.updateLcd()
+        if error:
+            QApplication.beep()
+            self.updateEntryLabel('Error: {0}'.format(error))
+        QTimer.singleShot(5000, self.updateEntryLabel)
+
+    def runSlowCmd(self, cmdStr):
+        """Run a core command on a scratch copy of the core in the worker.
+
+        The copy's registers are applied when it finishes.
+        """
+        scratch = self.calc.scratchCopy()
+
+        def applyCmd(result):
+            self.worker.recordTime(cmdStr, job.elapsed)
+            self.calc.applyScratch(scratch, cmdStr)
+            return ''
+
+        job = calcworker.Job('Running {0}...'.format(cmdStr), applyCmd)
+        job.setTask(scratch.cmd, cmdStr)
+        self.startWorker(job)
+
+    def solveCmd(self):
+        """Find a root of a command, starting from guesses in X and Y.
+
+        Puts the root in X, the previous estimate in Y and f(root) in Z.
+        """
+        name = self.chooseProgram('Command to solve for zero')
+        if not name:
+            return
+        tolerance, maxIter = self.calc.solveSettings()
+
+        def applyRoot(result):
+            root, previous, value, numEvals = result
+            self.calc.applyResults('SOLVE {0}'.format(name),
+                                   (root, previous, value))
+            return 'Solved with {0} evaluations'.format(numEvals)
+
+        job = calcworker.Job('Solving {0}...'.format(name), applyRoot)
+        job.setTask(calcnumeric.solve,
+                    job.cancellable(progcompile.compileScalar(self.calc,
+                                                              name)),
+                    self.calc.stack[0], self.calc.stack[1], tolerance,
+                    maxIter)
+        self.startWorker(job)
+
+    def integrateCmd(self):
+        """Integrate a command from Y to X.
+
+        Puts the integral in X and its error estimate in Y.
+        """
+        name = self.chooseProgram('Command to integrate from Y to X')
+        if not name:
+            return
+        start, end = self.calc.stack[1], self.calc.stack[0]
+        tolerance = self.calc.solveSettings()[0]
+        eqn = 'INTG {0}({1}, {2})'.format(name,
+                                          self.calc.formatNum(start).strip(),
+                                          self.calc.formatNum(end).strip())
+
+        def applyIntegral(result):
+            value, error, numEvals = result
+            self.calc.applyResults(eqn, (value, error))
+            return 'Integrated with {0} evaluations'.format(numEvals)
+
+        job = calcworker.Job('Integrating {0}...'.format(name),
+                             applyIntegral)
+        job.setTask(calcnumeric.integrate,
+                    job.cancellable(progcompile.compileBatch(self.calc,
+                                                             name)),
+                    start, end, tolerance)
+        self.startWorker(job)
+
+    def derivativeCmd(self):
+        """Find the derivative of a command at X.
+
+        Replaces X with the derivative.
+        """
+        name = self.chooseProgram('Command to differentiate at X')
+        if not name:
+            return
+        x = self.calc.stack[0]
+        eqn = 'DERIV {0}({1})'.format(name, self.calc.formatNum(x).strip())
+
+        def applyDerivative(result):
+            value, error, numEvals = result
+            self.calc.applyResults(eqn, (value,))
+            return 'Error estimate {0:.3g}, {1} evaluations'.format(error,
+                                                                    numEvals)
+
+        job = calcworker.Job('Differentiating {0}...'.format(name),
+                             applyDerivative)
+        job.setTask(calcnumeric.derivative,
+                    job.cancellable(progcompile.compileBatch(self.calc,
+                                                             name)), x)
+        self.startWorker(job)
+
+    def monteCarloCmd(self):
+        """Evaluate a command for X random inputs with parameters in Z and Y.
+
+        The results replace the statistics registers, and their mean and
+        standard deviation go in X and Y.
+        """
+        name = self.chooseProgram('Command to evaluate for random inputs')
+        if not name:
+            return
+        distNames = list(calcnumeric.distributions.keys())
+        distTexts = ['{0} - {1} in Z, {2} in Y'.format(dist.capitalize(),
+                                                       *params)
+                     for dist, params in calcnumeric.distributions.items()]
+        text, ok = QInputDialog.getItem(self, 'rpCalc', 'Input distribution',
+                                        distTexts, 0, False)
+        if not ok:
+            return
+        distribution = distNames[distTexts.index(text)]
+        count = int(self.calc.stack[0])
+        if not 1 < count <= 10 ** 10:
+            QMessageBox.warning(self, 'rpCalc', 'The number of inputs (X) '
+                                'must be from 2 to 10^10')
+            return
+        try:
+            sampler = calcnumeric.randomSampler(distribution,
+                                                self.calc.stack[2],
+                                                self.calc.stack[1])
+        except ValueError as err:
+            QMessageBox.warning(self, 'rpCalc', str(err))
+            return
+        batchSize = self.calc.option.intData('RandomBatchSize',
+                                             CalcCore.minRandomBatch,
+                                             CalcCore.maxRandomBatch)
+        stat = calcstats.StatRegister(self.calc.stat.compression)
+
+        def applyStats(numErrors):
+            if stat.count < 2:
+                raise ValueError('too many function errors')
+            self.calc.stat = stat
+            self.calc.applyResults('MONTE {0}({1})'.format(name, count),
+                                   (stat.means()[0], stat.stdDevs()[0]))
+            if numErrors:
+                return '{0} inputs skipped for errors'.format(numErrors)
+            return 'Mean in X, std dev in Y, see stats for more'
+
+        job = calcworker.Job('Evaluating {0} {1} times...'.format(name,
+                                                                  count),
+                             applyStats)
+        job.setTask(calcnumeric.monteCarlo,
+                    job.cancellable(progcompile.compileBatch(self.calc,
+                                                             name)),
+                    sampler, count, batchSize, stat)
+        self.startWorker(job)
+
     def addCmdButton(self, text, row, col):
         """Adds a CalcButton for command functions.
         """
@@ -446,9 +887,26 @@ class CalcDlg(QWidget):
         self.mainLay.addWidget(button, row, col, 1+extraRow, 1+extraCol)
         button.activated.connect(self.issueCmd)
 
+    def scheduleUpdate(self):
+        """Request a display update at the next frame.
+
+        Multiple requests before the timer fires result in one update.
+        """
+        if not self.updateTimer.isActive():
+            self.updateTimer.start()
+
+    def flushUpdate(self):
+        """Do any pending display update immediately.
+        """
+        if self.updateTimer.isActive():
+            self.updateTimer.stop()
+            self.updateLcd()
+
     def updateLcd(self):
         """Sets display back to CalcCore string.
         """
+        self.updateTimer.stop()
+        self.latency.mark('update')
         numDigits = int(self.calc.option.numData('NumDecimalPlaces', 0, 9)) + 9
         if self.calc.option.boolData('ThousandsSeparator') or \
                 self.calc.option.boolData('UseEngNotation'):
@@ -459,30 +917,103 @@ class CalcDlg(QWidget):
             for num, lcd in zip(nums, self.extraLcds):
                 lcd.setDisplay(num, numDigits)
         self.updateExtra()
+        self.latency.mark('updated')
+        if self.latency.marks:
+            self.lcd.update()   # ensure a paint ends the latency timing
 
     def issueCmd(self, text):
         """Sends command text to CalcCore - connected to button signals.
         """
+        if self.worker.busy():
+            QApplication.beep()    # a slow command is still running
+            return
         mode = self.calc.flag
         text = str(text).upper()
+        if text != 'OPT' and text not in CalcDlg.dlgCmdList:
+            self.latency.startEvent(text)
+        if self.macroCmds is not None and \
+                text not in CalcDlg.dlgCmdList and \
+                text not in CalcDlg.noMacroCmdList:
+            self.recordMacroCmd(text)
         if text == 'OPT':
             self.setOptions()
         elif text == 'SHOW':
             if not self.showMode:
+                self.flushUpdate()
                 valueStr = self.calc.sciFormatX(11).replace('e', ' E', 1)
                 self.lcd.setNumDigits(19)
                 self.lcd.display(valueStr)
+                self.lcd.dispValue = None
                 self.showMode = True
                 return
         elif text == 'EXIT':
             self.close()
             return
+        elif text == 'IMPORT':
+            self.importData()
+        elif text == 'PASTE':
+            self.pasteCmds()
+        elif text == 'MREC':
+            self.startMacro()
+        elif text == 'MEND':
+            self.endMacro()
+        elif text == 'SWEEP':
+            self.sweepCmd()
+        elif text == 'SOLVE':
+            self.solveCmd()
+        elif text == 'INTG':
+            self.integrateCmd()
+        elif text == 'DERIV':
+            self.derivativeCmd()
+        elif text == 'MONTE':
+            self.monteCarloCmd()
+        elif self.worker.isSlow(text, self.calc):
+            self.runSlowCmd(text)
         else:
+            startTime = time.perf_counter()
             self.calc.cmd(text)
+            self.worker.recordTime(text, time.perf_counter() - startTime)
         if text in ('SCI', 'DEG', 'OPT') or mode == Mode.decPlcMode:
             self.updateEntryLabel()
         self.showMode = False
-        self.updateLcd()
+        self.scheduleUpdate()
+
+    def cmdNames(self):
+        """Return a list of all command names that can be typed.
+        """
+        return (list(self.cmdDict.keys()) + self.calc.typedCmds +
+                CalcDlg.dlgCmdList)
+
+    def commandTrie(self):
+        """Return the trie of typed command names, adding any new names.
+
+        The core's typedCmds list only grows, so only new entries are added.
+        """
+        if self.numTrieCmds < len(self.calc.typedCmds):
+            for name in self.calc.typedCmds[self.numTrieCmds:]:
+                self.cmdTrie.add(name)
+            self.numTrieCmds = len(self.calc.typedCmds)
+        return self.cmdTrie
+
+    def typedCmd(self, text):
+        """Issue a complete typed command, return True if it matches.
+
+        The entry string is cleared first so commands can set the label.
+        """
+        if not self.commandTrie().isCommand(text):
+            return False
+        self.cmdTrie.addUse(text)
+        button = self.cmdDict.get(text)
+        if button:
+            self.entryStr = ''
+            self.updateEntryLabel()
+            button.clickEvent()
+            button.tmpDown(300)
+            return True
+        self.entryStr = ''
+        self.updateEntryLabel()
+        self.issueCmd(text)
+        return True
 
     def textEntry(self, ch):
         """Searches for button match from text entry.
@@ -494,39 +1025,90 @@ class CalcDlg(QWidget):
         elif ord(ch) == 27:  # escape key
             self.entryStr = ''
         elif ch == '\t':     # tab key
-            cmds = [key for key in self.cmdDict.keys() if
-                    key.startswith(self.entryStr.upper())]
-            if len(cmds) == 1:
-                button = self.cmdDict[cmds[0]]
-                button.clickEvent()
-                button.tmpDown(300)
-                self.entryStr = ''
+            prefix = self.entryStr.upper().lstrip(':')
+            name = self.commandTrie().completion(prefix)
+            if name:
+                return self.typedCmd(name)
+            newPrefix = self.cmdTrie.commonPrefix(prefix)
+            if newPrefix != prefix:
+                self.entryStr += newPrefix[len(prefix):]
             else:
                 QApplication.beep()
         elif ch == ':' and not self.entryStr:
             self.entryStr = ':'   # optional command prefix
+        elif ch == '=' and not self.entryStr:
+            self.entryStr = '='   # start of an algebraic expression
         else:
             newStr = (self.entryStr + ch).upper()
             if newStr == ':Q':    # vim-like shortcut
                 newStr = 'EXIT'
-            button = self.cmdDict.get(newStr.lstrip(':'))
-            if button:
-                button.clickEvent()
-                button.tmpDown(300)
-                self.entryStr = ''
+            if self.typedCmd(newStr.lstrip(':')):
+                return True
+            if self.commandTrie().hasPrefix(newStr.lstrip(':')):
+                self.entryStr += ch
             else:
-                if [key for key in self.cmdDict.keys() if
-                    key.startswith(newStr.lstrip(':'))]:
-                    self.entryStr += ch
-                else:
+                QApplication.beep()
+                return False
+        self.updateEntryLabel()
+        return True
+
+    def exprEntry(self, ch):
+        """Add to an algebraic expression, evaluate it on the enter key.
+        """
+        if not ch:
+            return False
+        if ch in ('\r', '\n'):
+            text = self.entryStr[1:]
+            self.entryStr = ''
+            self.updateEntryLabel()
+            if text.strip():
+                self.latency.startEvent('=')
+                error = self.calc.exprCmd(text)
+                if error:
                     QApplication.beep()
-                    return False
+                    self.updateEntryLabel('Error at character {0}: {1}'.
+                                          format(error[0] + 1, error[1]))
+                    QTimer.singleShot(5000, self.updateEntryLabel)
+                self.showMode = False
+                self.scheduleUpdate()
+            return True
+        if ord(ch) == 8:   # backspace key
+            self.entryStr = self.entryStr[:-1]
+        elif ord(ch) == 27:  # escape key
+            self.entryStr = ''
+        elif ch.isprintable():
+            self.entryStr += ch
+        else:
+            return False
         self.updateEntryLabel()
         return True
 
     def keyPressEvent(self, keyEvent):
-        """Event handler for keys - checks for numbers and typed commands.
+        """Event handler for keys - times the event if latency is measured.
         """
+        self.latency.markInput()
+        self.handleKey(keyEvent)
+        self.latency.clearInput()
+
+    def handleKey(self, keyEvent):
+        """Handle key presses - checks for numbers and typed commands.
+        """
+        if self.worker.busy():
+            if keyEvent.key() == Qt.Key_Escape:
+                self.cancelWorker()
+            else:
+                QApplication.beep()
+            return
+        if keyEvent.matches(QKeySequence.Paste):
+            self.issueCmd('PASTE')
+            return
+        if self.entryStr.startswith('='):
+            if not self.exprEntry(str(keyEvent.text())):
+                QWidget.keyPressEvent(self, keyEvent)
+            return
+        if not self.entryStr and keyEvent.key() in self.macroKeys:
+            self.issueCmd(self.macroKeys[keyEvent.key()])
+            return
         button = self.mainDict.get(keyEvent.key())
         if not self.entryStr and button:
             button.clickEvent()
@@ -569,6 +1151,7 @@ class CalcDlg(QWidget):
     def closeEvent(self, event):
         """Saves the stack prior to closing.
         """
+        self.worker.cancel()
         self.calc.saveStack()
         contentsRect = self.geometry()
         frameRect = self.frameGeometry()
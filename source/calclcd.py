@@ -25,16 +25,28 @@ class Lcd(QLCDNumber):
         self.setSegmentStyle(QLCDNumber.Filled)
         self.setMinimumSize(10, 23)
         self.setFrameStyle(QFrame.NoFrame)
+        self.dispValue = None   # last setDisplay args, to skip repeats
+        self.paintHook = None   # called after each paint if set
 
     def setDisplay(self, text, numDigits):
-        """Update display value.
+        """Update display value, skip if unchanged.
         """
+        if (text, numDigits) == self.dispValue:
+            return
+        self.dispValue = (text, numDigits)
         text = text.replace('e', ' E', 1)  # add space before exp
         if len(text) > numDigits:  # mark if digits hidden
             text = 'c{0}'.format(text[1-numDigits:])
         self.setNumDigits(numDigits)
         self.display(text)
 
+    def paintEvent(self, event):
+        """Paint the display, then call the paint hook.
+        """
+        QLCDNumber.paintEvent(self, event)
+        if self.paintHook:
+            self.paintHook()
+
     def sizeHint(self):
         """Set prefered size.
         """
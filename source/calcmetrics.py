@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# calcmetrics.py, collects server metrics in the Prometheus text format
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import math
+
+# histogram bucket bounds are powers of two nanoseconds, about 1 us to 17 s
+bucketBits = range(10, 35, 2)
+
+
+class LatencyHistogram:
+    """Count and total of times, with power of two nanosecond buckets.
+    """
+    __slots__ = ('buckets', 'totalNs')
+    def __init__(self):
+        self.buckets = [0] * 65    # bit length of ns -> count
+        self.totalNs = 0
+
+    def add(self, ns):
+        """Record one time in nanoseconds.
+        """
+        self.buckets[min(ns.bit_length(), 64)] += 1
+        self.totalNs += ns
+
+    def merge(self, other):
+        """Add the counts from another histogram.
+        """
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.totalNs += other.totalNs
+
+
+class MetricShard:
+    """Counters and histograms that are updated by a single thread.
+
+    Each thread writes only to its own shard, so updates need no lock.
+    Scrapes read all shards and may see counts one update behind.
+    """
+    def __init__(self):
+        self.counters = {}      # (name, labels) -> count
+        self.histograms = {}    # (name, labels) -> LatencyHistogram
+
+    def count(self, name, labels=(), amount=1):
+        """Add to a counter, labels is a tuple of (name, value) pairs.
+        """
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, ns):
+        """Add a time in nanoseconds to a histogram.
+        """
+        hist = self.histograms.get((name, labels))
+        if hist is None:
+            hist = self.histograms[(name, labels)] = LatencyHistogram()
+        hist.add(ns)
+
+
+class MetricsRegistry:
+    """Describes metrics and renders the sum of all shards.
+
+    Gauges are read from functions when rendering, which happens on the
+    thread that owns the values they read.
+    """
+    def __init__(self):
+        self.shards = []
+        self.descriptions = {}    # name -> (type, help text)
+        self.gauges = {}          # name -> function returning a number
+
+    def describe(self, name, metricType, helpText):
+        """Add the type and help text for a counter or histogram.
+        """
+        self.descriptions[name] = (metricType, helpText)
+
+    def addGauge(self, name, helpText, func):
+        """Add a gauge whose value is returned by func().
+        """
+        self.descriptions[name] = ('gauge', helpText)
+        self.gauges[name] = func
+
+    def newShard(self):
+        """Return a new shard for one thread's updates.
+        """
+        shard = MetricShard()
+        self.shards.append(shard)
+        return shard
+
+    def collect(self):
+        """Return the summed counters and merged histograms of all shards.
+        """
+        counters = {}
+        histograms = {}
+        for shard in self.shards[:]:
+            # dict copies are made while holding the GIL, so they are safe
+            # while the owning thread adds new keys
+            for key, count in dict(shard.counters).items():
+                counters[key] = counters.get(key, 0) + count
+            for key, hist in dict(shard.histograms).items():
+                if key not in histograms:
+                    histograms[key] = LatencyHistogram()
+                histograms[key].merge(hist)
+        return counters, histograms
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format.
+        """
+        counters, histograms = self.collect()
+        lines = []
+        for name in sorted(self.descriptions):
+            metricType, helpText = self.descriptions[name]
+            lines.append('# HELP {0} {1}'.format(name, helpText))
+            lines.append('# TYPE {0} {1}'.format(name, metricType))
+            if metricType == 'gauge':
+                lines.append('{0} {1}'.format(name,
+                                              formatValue(self.gauges[name]())))
+            elif metricType == 'counter':
+                for (keyName, labels), count in sorted(counters.items()):
+                    if keyName == name:
+                        lines.append('{0}{1} {2}'.format(name,
+                                                         formatLabels(labels),
+                                                         count))
+            else:
+                for (keyName, labels), hist in sorted(histograms.items(),
+                                                      key=lambda item:
+                                                      item[0]):
+                    if keyName == name:
+                        lines.extend(histogramLines(name, labels, hist))
+        return '\n'.join(lines) + '\n'
+
+
+def histogramLines(name, labels, hist):
+    """Return the bucket, sum and count lines for a histogram.
+    """
+    lines = []
+    buckets = hist.buckets[:]
+    total = 0
+    start = 0
+    for bit in bucketBits:
+        total += sum(buckets[start:bit + 1])
+        start = bit + 1
+        bound = formatValue(2 ** bit / 1e9)
+        lines.append('{0}_bucket{1} {2}'.
+                     format(name, formatLabels(labels + (('le', bound),)),
+                            total))
+    total += sum(buckets[start:])
+    lines.append('{0}_bucket{1} {2}'.
+                 format(name, formatLabels(labels + (('le', '+Inf'),)),
+                        total))
+    lines.append('{0}_sum{1} {2}'.format(name, formatLabels(labels),
+                                         formatValue(hist.totalNs / 1e9)))
+    lines.append('{0}_count{1} {2}'.format(name, formatLabels(labels), total))
+    return lines
+
+def formatLabels(labels):
+    """Return a label set string, empty if there are no labels.
+    """
+    if not labels:
+        return ''
+    return '{{{0}}}'.format(','.join('{0}="{1}"'.
+                                     format(key, value.replace('\\', '\\\\').
+                                            replace('"', '\\"').
+                                            replace('\n', '\\n'))
+                                     for key, value in labels))
+
+def formatValue(num):
+    """Return a number in the exposition format.
+    """
+    if isinstance(num, int):
+        return str(num)
+    if math.isnan(num):
+        return 'NaN'
+    if math.isinf(num):
+        return '+Inf' if num > 0 else '-Inf'
+    return repr(float(num))
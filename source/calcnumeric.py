@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# calcnumeric.py, numerical methods for functions of one variable
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import math
+import random
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+epsilon = sys.float_info.epsilon
+
+
+class NumericError(ValueError):
+    """Raised when a method does not converge.
+    """
+    pass
+
+
+class CountedFunction:
+    """Wraps a function of x to count its evaluations.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.count = 0
+
+    def __call__(self, x):
+        self.count += 1
+        return self.func(x)
+
+
+def solve(func, x0, x1, tolerance=1e-12, maxIter=100):
+    """Find a root of func starting from guesses x0 and x1.
+
+    Secant steps are taken until the root is bracketed by a sign change,
+    then Brent's method narrows the bracket.  The tolerance is relative to
+    the size of the root, or absolute for roots smaller than one.  Returns
+    the root, the previous estimate, the function value at the root and
+    the number of evaluations.  Raises NumericError if no root is found.
+    """
+    func = CountedFunction(func)
+    if x0 == x1:
+        x1 = x0 + max(abs(x0) * 1e-3, 1e-3)
+    f0, f1 = func(x0), func(x1)
+    if not (math.isfinite(f0) and math.isfinite(f1)):
+        raise NumericError('function error at a guess')
+    numIter = 0
+    while f0 * f1 > 0.0:
+        numIter += 1
+        if numIter > maxIter:
+            raise NumericError('no sign change found')
+        if f1 == f0:
+            x2 = x1 + (x1 - x0)    # flat, so move farther away
+        else:
+            x2 = x1 - f1 * (x1 - x0) / (f1 - f0)
+        f2 = func(x2)
+        halvings = 0
+        while not math.isfinite(f2):
+            halvings += 1     # back off toward x1 from a function error
+            if halvings > 30 or not math.isfinite(x2):
+                raise NumericError('function error near {0:g}'.format(x2))
+            x2 = x1 + (x2 - x1) / 2
+            f2 = func(x2)
+        if abs(x2 - x1) <= tolerance * max(1.0, abs(x2)) and \
+                abs(f2) <= abs(f1):
+            if abs(f2) < math.sqrt(epsilon) * max(1.0, abs(f0)):
+                return (x2, x1, f2, func.count)    # touches zero, no sign
+            raise NumericError('no root, an extremum is near {0:g}'.
+                               format(x2))
+        x0, f0, x1, f1 = x1, f1, x2, f2
+    if f1 == 0.0:
+        return (x1, x0, f1, func.count)
+    if f0 == 0.0:
+        return (x0, x1, f0, func.count)
+    return brent(func, x0, x1, f0, f1, tolerance, maxIter)
+
+def brent(func, a, b, fa, fb, tolerance, maxIter):
+    """Return a root between a and b, where fa and fb have opposite signs.
+
+    Uses inverse quadratic interpolation or secant steps, with bisection
+    when those converge too slowly.  Returns the same tuple as solve, with
+    the count from a CountedFunction.
+    """
+    c, fc = a, fa
+    d = e = b - a
+    for i in range(maxIter):
+        if (fb > 0.0) == (fc > 0.0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2.0 * epsilon * abs(b) + 0.5 * tolerance * max(1.0, abs(b))
+        middle = 0.5 * (c - b)
+        if abs(middle) <= tol or fb == 0.0:
+            return (b, a, fb, func.count)
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:            # secant step
+                p = 2.0 * middle * s
+                q = 1.0 - s
+            else:                 # inverse quadratic interpolation
+                q = fa / fc
+                r = fb / fc
+                p = s * (2.0 * middle * q * (q - r) - (b - a) * (r - 1.0))
+                q = (q - 1.0) * (r - 1.0) * (s - 1.0)
+            if p > 0.0:
+                q = -q
+            else:
+                p = -p
+            if 2.0 * p < min(3.0 * middle * q - abs(tol * q), abs(e * q)):
+                e = d
+                d = p / q
+            else:
+                d = e = middle    # bisect
+        else:
+            d = e = middle
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, middle)
+        fb = func(b)
+        if not math.isfinite(fb):
+            raise NumericError('function error near {0:g}'.format(b))
+    raise NumericError('no convergence in {0} iterations'.format(maxIter))
+
+# Gauss-Kronrod 7-15 point nodes and weights for [-1, 1], the Gauss nodes
+# are the odd Kronrod nodes
+kronrodNodes = (0.991455371120812639206854697526329,
+                0.949107912342758524526189684047851,
+                0.864864423359769072789712788640926,
+                0.741531185599394439863864773280788,
+                0.586087235467691130294144845693013,
+                0.405845151377397166906606412076961,
+                0.207784955007898467600689403773245, 0.0)
+kronrodWeights = (0.022935322010529224963732008058970,
+                  0.063092092629978553290700663189204,
+                  0.104790010322250183839876322541518,
+                  0.140653259715525918745189590510238,
+                  0.169004726639267902826583426598550,
+                  0.190350578064785409913256402421014,
+                  0.204432940075298892414161999234649,
+                  0.209482141084727828012999174891714)
+gaussWeights = (0.129484966168869693270611432679082,
+                0.279705391489276667901467771423780,
+                0.381830050505118944950369775488975,
+                0.417959183673469387755102040816327)
+# all 15 nodes from -1 to 1 with matching weights
+gkNodes = tuple(-x for x in kronrodNodes[:-1]) + kronrodNodes[::-1]
+gkWeights = kronrodWeights[:-1] + kronrodWeights[::-1]
+gWeights = tuple(0.0 if i % 2 == 0 else gaussWeights[min(i, 14 - i) // 2]
+                 for i in range(15))
+
+def checkValues(xValues, values):
+    """Raise NumericError if any value is not a finite number.
+    """
+    for x, value in zip(xValues, values):
+        if not math.isfinite(value):
+            raise NumericError('function error at {0:g}'.format(x))
+
+def integrate(batchFunc, a, b, tolerance=1e-12, maxEvals=1000000):
+    """Return the integral of a function from a to b.
+
+    batchFunc takes a list of x values and returns a list of results.  The
+    range is split adaptively, and each round evaluates the Gauss-Kronrod
+    nodes of all intervals that are split in a single batch.  The
+    tolerance is relative to the size of the result.  Returns the
+    integral, the error estimate and the number of evaluations.
+    """
+    numEvals = 0
+    intervals = [(a, b)]
+    done = []    # (integral, error) of intervals within tolerance
+    total = error = 0.0
+    while intervals:
+        xValues = []
+        for start, end in intervals:
+            center = 0.5 * (start + end)
+            halfWidth = 0.5 * (end - start)
+            xValues.extend(center + halfWidth * node for node in gkNodes)
+        values = batchFunc(xValues)
+        checkValues(xValues, values)
+        numEvals += len(xValues)
+        results = []
+        for i, (start, end) in enumerate(intervals):
+            halfWidth = 0.5 * (end - start)
+            points = values[15 * i:15 * i + 15]
+            kronrod = halfWidth * math.fsum(w * f for w, f in
+                                            zip(gkWeights, points))
+            gauss = halfWidth * math.fsum(w * f for w, f in
+                                          zip(gWeights, points))
+            results.append((kronrod, abs(kronrod - gauss)))
+        total = math.fsum([result[0] for result in done + results])
+        error = math.fsum([result[1] for result in done + results])
+        target = max(tolerance * abs(total), 50 * epsilon * abs(total))
+        if error <= target:
+            return (total, error, numEvals)
+        if numEvals + 30 * len(intervals) > maxEvals:
+            break
+        # split intervals with more than their share of the allowed error
+        newIntervals = []
+        for (start, end), result in zip(intervals, results):
+            if result[1] > target * abs(end - start) / abs(b - a):
+                center = 0.5 * (start + end)
+                if not start < center < end and not end < center < start:
+                    done.append(result)     # too narrow to split
+                    continue
+                newIntervals.extend([(start, center), (center, end)])
+            else:
+                done.append(result)
+        intervals = newIntervals
+    raise NumericError('no convergence in {0} evaluations, error {1:g}'.
+                       format(numEvals, error))
+
+def derivative(batchFunc, x, numSteps=10):
+    """Return the derivative of a function at x.
+
+    Central differences with step sizes halving from a tenth of x (or 0.1)
+    are improved by Richardson extrapolation, keeping the estimate with
+    the smallest error.  The two points for each step are evaluated in
+    one batch, stopping when the estimates get worse.  Returns the
+    derivative, the error estimate and the number of evaluations.
+    """
+    steps = [0.1 * max(1.0, abs(x)) / 2 ** i for i in range(numSteps)]
+    best = None
+    bestError = math.inf
+    prevRow = []
+    numEvals = 0
+    for i, step in enumerate(steps):
+        xValues = [x + step, x - step]
+        values = batchFunc(xValues)
+        checkValues(xValues, values)
+        numEvals += 2
+        row = [(values[0] - values[1]) / (2 * step)]
+        for j in range(1, i + 1):
+            factor = 4.0 ** j
+            row.append(row[j - 1] + (row[j - 1] - prevRow[j - 1]) /
+                       (factor - 1.0))
+            error = max(abs(row[j] - row[j - 1]),
+                        abs(row[j] - prevRow[j - 1]))
+            if error <= bestError:
+                best, bestError = row[j], error
+        if i and abs(row[i] - prevRow[i - 1]) >= 2.0 * bestError:
+            break     # higher order estimates are getting worse
+        prevRow = row
+    return (best, bestError, numEvals)
+
+# random input distributions and their parameter names
+distributions = {'uniform': ('low', 'high'),
+                 'normal': ('mean', 'std dev'),
+                 'lognormal': ('log mean', 'log std dev')}
+
+def randomSampler(distribution, param1, param2, seed=None):
+    """Return a function that gives a batch of count random draws.
+
+    The parameters are the low and high limits for uniform draws, or the
+    mean and standard deviation for normal draws and for the logarithm of
+    lognormal draws.  Uses NumPy arrays if available.
+    """
+    if distribution != 'uniform' and param2 < 0.0:
+        raise NumericError('the standard deviation is negative')
+    if numpy is not None:
+        generator = numpy.random.default_rng(seed)
+        method = {'uniform': generator.uniform, 'normal': generator.normal,
+                  'lognormal': generator.lognormal}[distribution]
+        return lambda count: method(param1, param2, count)
+    generator = random.Random(seed)
+    method = {'uniform': generator.uniform, 'normal': generator.gauss,
+              'lognormal': generator.lognormvariate}[distribution]
+    return lambda count: [method(param1, param2) for i in range(count)]
+
+def monteCarlo(batchFunc, sampler, count, batchSize, stat):
+    """Add the results of a function for count random inputs to stat.
+
+    batchFunc takes a batch of inputs from sampler and returns a list of
+    results, which are added to the StatRegister stat without being kept.
+    Results with function errors are skipped.  Returns the number skipped.
+    """
+    numErrors = 0
+    for start in range(0, count, batchSize):
+        values = batchFunc(sampler(min(batchSize, count - start)))
+        goodValues = [value for value in values if math.isfinite(value)]
+        numErrors += len(values) - len(goodValues)
+        stat.addValues(goodValues)
+    return numErrors
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# calcprofile.py, provides optional timing instrumentation for the core
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import time
+import json
+import atexit
+import tracemalloc
+
+
+class Histogram:
+    """Call count and power of two latency buckets for one timed name.
+    """
+    def __init__(self):
+        self.count = 0
+        self.totalNs = 0
+        self.maxNs = 0
+        self.buckets = {}    # bit length of ns -> count
+
+    def add(self, ns):
+        """Record one call taking ns nanoseconds.
+        """
+        self.count += 1
+        self.totalNs += ns
+        if ns > self.maxNs:
+            self.maxNs = ns
+        bucket = ns.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Return the upper bound in ns of the bucket holding the fraction.
+        """
+        target = fraction * self.count
+        total = 0
+        for bucket in sorted(self.buckets):
+            total += self.buckets[bucket]
+            if total >= target:
+                return min(2 ** bucket, self.maxNs)
+        return self.maxNs
+
+    def summary(self):
+        """Return a dict of statistics for a JSON report.
+        """
+        return {'count': self.count,
+                'totalNs': self.totalNs,
+                'meanNs': self.totalNs // self.count if self.count else 0,
+                'maxNs': self.maxNs,
+                'p50Ns': self.percentile(0.5),
+                'p99Ns': self.percentile(0.99),
+                'histogram': {'<{0}'.format(2 ** bucket):
+                              self.buckets[bucket]
+                              for bucket in sorted(self.buckets)}}
+
+
+class AllocStats:
+    """Call count and allocation totals for one measured name.
+    """
+    def __init__(self):
+        self.count = 0
+        self.peakBytes = 0    # sum of each call's peak above its start
+        self.maxPeakBytes = 0
+        self.netBytes = 0     # sum of memory still held after each call
+        self.netBlocks = 0
+
+    def add(self, peakBytes, netBytes, netBlocks):
+        """Record one call's peak and retained bytes and retained blocks.
+        """
+        self.count += 1
+        self.peakBytes += peakBytes
+        if peakBytes > self.maxPeakBytes:
+            self.maxPeakBytes = peakBytes
+        self.netBytes += netBytes
+        self.netBlocks += netBlocks
+
+    def summary(self):
+        """Return a dict of statistics for a JSON report.
+        """
+        count = self.count or 1
+        return {'count': self.count,
+                'meanPeakBytes': self.peakBytes / count,
+                'maxPeakBytes': self.maxPeakBytes,
+                'netBytes': self.netBytes,
+                'meanNetBytes': self.netBytes / count,
+                'netBlocks': self.netBlocks,
+                'meanNetBlocks': self.netBlocks / count}
+
+
+class Profiler:
+    """Times instrumented methods if enabled, otherwise adds no overhead.
+
+    Instrumenting replaces methods on the instance, so nothing is wrapped
+    unless profiling is enabled before objects are created.
+    """
+    coreMethods = ('formatNum', 'updateXStr', 'runOps')
+    optionMethods = ('boolData', 'intData', 'numData', 'strData',
+                     'writeChanges')
+    def __init__(self):
+        self.enabled = False
+        self.path = ''
+        self.stats = {}
+
+    def enable(self, path):
+        """Turn on profiling, write the JSON report to path at exit.
+        """
+        self.enabled = True
+        self.path = path
+        atexit.register(self.writeReport)
+
+    def record(self, name, ns):
+        """Add a timing for name.
+        """
+        hist = self.stats.get(name)
+        if hist is None:
+            hist = self.stats[name] = Histogram()
+        hist.add(ns)
+
+    def instrument(self, obj, methodName, keyFunc=None):
+        """Replace a method of obj with a timed version.
+
+        keyFunc, if given, returns the statistics name from the call
+        arguments, otherwise the class and method names are used.
+        """
+        method = getattr(obj, methodName)
+        name = '{0}.{1}'.format(type(obj).__name__, methodName)
+        clock = time.perf_counter_ns
+        record = self.record
+
+        def timedMethod(*args):
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                record(keyFunc(args) if keyFunc else name, clock() - start)
+
+        setattr(obj, methodName, timedMethod)
+
+    def instrumentCore(self, calc):
+        """Add timing to the hot paths of a CalcCore and its options.
+        """
+        if not self.enabled:
+            return
+        self.instrument(calc, 'execCmd', lambda args: 'CalcCore.cmd ' +
+                        args[0])
+        for methodName in self.coreMethods:
+            self.instrument(calc, methodName)
+        for methodName in self.optionMethods:
+            self.instrument(calc.option, methodName)
+
+    def report(self):
+        """Return a dict of statistics for all timed names.
+        """
+        return {name: self.stats[name].summary()
+                for name in sorted(self.stats)}
+
+    def writeReport(self):
+        """Write the JSON report file.
+        """
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, indent=2)
+        except IOError:
+            print('Error - could not write profile file', self.path)
+
+
+class AllocProfiler(Profiler):
+    """Measures memory allocated by instrumented methods using tracemalloc.
+
+    For each call, records the peak traced memory above the starting amount
+    (including temporary objects that were freed), the traced bytes still
+    held afterward and the change in allocated blocks.  Nested instrumented
+    calls are included in the outermost call only.
+    """
+    coreMethods = ('formatNum', 'numberStr', 'updateXStr', 'runOps')
+    optionMethods = ('writeChanges',)
+    def __init__(self):
+        Profiler.__init__(self)
+        self.depth = 0
+
+    def enable(self, path):
+        """Start tracing allocations, write the JSON report to path at exit.
+        """
+        tracemalloc.start()
+        Profiler.enable(self, path)
+
+    def record(self, name, peakBytes, netBytes, netBlocks):
+        """Add allocation results for name.
+        """
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = AllocStats()
+        stats.add(peakBytes, netBytes, netBlocks)
+
+    def instrument(self, obj, methodName, keyFunc=None):
+        """Replace a method of obj with an allocation measuring version.
+
+        keyFunc, if given, returns the statistics name from the call
+        arguments, otherwise the class and method names are used.
+        """
+        method = getattr(obj, methodName)
+        name = '{0}.{1}'.format(type(obj).__name__, methodName)
+        record = self.record
+
+        def measuredMethod(*args):
+            if self.depth:
+                return method(*args)
+            self.depth += 1
+            startBlocks = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+            startBytes = tracemalloc.get_traced_memory()[0]
+            try:
+                return method(*args)
+            finally:
+                currentBytes, peakBytes = tracemalloc.get_traced_memory()
+                netBlocks = sys.getallocatedblocks() - startBlocks
+                self.depth -= 1
+                record(keyFunc(args) if keyFunc else name,
+                       peakBytes - startBytes, currentBytes - startBytes,
+                       netBlocks)
+
+        setattr(obj, methodName, measuredMethod)
+
+
+profiler = Profiler()
+allocProfiler = AllocProfiler()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# calcserver.py, serves the calculator core over a local socket
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import os
+import stat
+import signal
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import numbers
+import math
+import option
+import optiondefaults
+import calcstats
+import dataimport
+import asynccalc
+import calcmetrics
+from calccore import CalcCore, Mode
+
+defaultSessions = 4
+maxLineLength = 1024 * 1024
+
+
+def defaultPath():
+    """Return the socket path used if none is given.
+    """
+    runDir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runDir, 'rpcalc.sock')
+
+
+class RequestError(ValueError):
+    """Raised for a request line that can't be run, with its id if known.
+    """
+    def __init__(self, message, requestId=None):
+        ValueError.__init__(self, message)
+        self.requestId = requestId
+
+
+def isFiniteNumber(num):
+    """Return True if num is a JSON number that is a finite float.
+    """
+    if not isinstance(num, numbers.Real) or isinstance(num, bool):
+        return False
+    try:
+        return math.isfinite(num)
+    except OverflowError:    # an integer too large for a float
+        return False
+
+
+def parseRequest(line):
+    """Return the id, command text and starting stack from a request line.
+
+    A request is a JSON object with a "cmds" string of numbers and
+    commands, and optional "id" and "stack" (up to four numbers, X first)
+    members.  Stack values must be finite.
+    """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        raise RequestError('invalid JSON')
+    if not isinstance(request, dict):
+        raise RequestError('request is not an object')
+    requestId = request.get('id')
+    cmds = request.get('cmds')
+    stack = request.get('stack', [])
+    if not isinstance(cmds, str):
+        raise RequestError('"cmds" must be a string', requestId)
+    if not isinstance(stack, list) or len(stack) > 4 or \
+            not all(isFiniteNumber(num) for num in stack):
+        raise RequestError('"stack" must be a list of up to 4 finite '
+                           'numbers', requestId)
+    return requestId, cmds, [float(num) for num in stack]
+
+
+class Session:
+    """A pooled core with its own actor thread.
+
+    The core is reset before each request, so requests never see each
+    other's registers or setting changes.
+    """
+    def __init__(self, sharedOption, metrics):
+        calc = CalcCore(sharedOption)
+        self.shard = metrics.newShard()    # only updated on the actor thread
+        self.instrumentCore(calc, self.shard)
+        self.actor = asynccalc.CalcActor(calc)
+        self.numRequests = 0
+
+    def instrumentCore(self, calc, shard):
+        """Record command times in a metric shard.
+
+        The wrapper only runs on this session's actor thread, the shard's
+        single writer.  Unknown commands share one label.
+        """
+        clock = time.perf_counter_ns
+        execCmd = calc.execCmd
+
+        def timedCmd(cmdStr):
+            start = clock()
+            result = execCmd(cmdStr)
+            shard.observe('rpcalc_command_duration_seconds',
+                          (('command', cmdStr if result else 'unknown'),),
+                          clock() - start)
+            return result
+
+        calc.execCmd = timedCmd
+
+    def reset(self, calc):
+        """Clear the registers and setting changes.  Runs on the actor thread.
+        """
+        calc.option.userDict.clear()
+        calc.option.chgList = []
+        calc.stack.replaceAll([0.0] * 4)
+        calc.mem[:] = [0.0] * 10
+        calc.stat = calcstats.StatRegister()
+        calc.dataReg = dataimport.DataRegister()
+        calc.history = []
+        calc.base = 10
+        calc.flag = Mode.saveMode
+        calc.setAltBaseOptions()
+        calc.setStatOptions()
+
+    def execute(self, calc, cmds, stack):
+        """Run a request on a reset core, return the response members.
+
+        Session options are never written, so the settings the request
+        changed are counted instead.  Runs on the actor thread.
+        """
+        self.reset(calc)
+        calc.stack[:len(stack)] = stack
+        calc.updateXStr()
+        error = calc.bulkCmd(cmds)
+        self.numRequests += 1
+        if calc.option.userDict:
+            self.shard.count('rpcalc_option_changes_total', (),
+                             len(calc.option.userDict))
+        return {'stack': list(calc.stack), 'x': calc.xStr,
+                'error': {'pos': error[0], 'token': error[1]} if error
+                         else None}
+
+    async def run(self, cmds, stack):
+        """Run a request on the actor thread, return the response members.
+        """
+        return await self.actor.call(lambda calc:
+                                     self.execute(calc, cmds, stack))
+
+    def close(self):
+        """Stop the actor thread.
+        """
+        self.actor.close()
+
+
+class SessionPool:
+    """A fixed set of sessions, each used by one request at a time.
+
+    All sessions read the same loaded option table.  Requests wait for a
+    free session when all are busy.
+    """
+    def __init__(self, metrics, numSessions=defaultSessions):
+        self.option = option.Option('rpcalc', 20)
+        self.option.loadAll(optiondefaults.defaultList)
+        self.sessions = [Session(self.option, metrics) for i in
+                         range(numSessions)]
+        self.idle = None
+        self.numWaiting = 0    # requests waiting for a free session
+
+    def start(self):
+        """Make the idle queue, must be called on the server's event loop.
+        """
+        self.idle = asyncio.Queue()
+        for session in self.sessions:
+            self.idle.put_nowait(session)
+
+    async def run(self, cmds, stack):
+        """Run a request on the next free session.
+        """
+        self.numWaiting += 1
+        try:
+            session = await self.idle.get()
+        finally:
+            self.numWaiting -= 1
+        try:
+            return await session.run(cmds, stack)
+        finally:
+            self.idle.put_nowait(session)
+
+    def numBusy(self):
+        """Return the number of sessions running requests.
+        """
+        return len(self.sessions) - self.idle.qsize() if self.idle else 0
+
+    def close(self):
+        """Stop all session threads.
+        """
+        for session in self.sessions:
+            session.close()
+
+
+class CalcServer:
+    """Serves line-delimited JSON requests on a Unix domain socket.
+
+    Each line is a request object from parseRequest, answered by one line
+    with the "id", the final "stack" (X first), the "x" display string
+    and an "error" that is null, the position and token of a failed
+    command, or a message for a bad request or a result that is not
+    finite.  A connection's requests are answered in order, and separate
+    connections run concurrently.  An HTTP "GET /metrics" request, on the
+    socket or on an optional localhost port, returns the metrics in the
+    Prometheus text format.
+    """
+    def __init__(self, path, numSessions=defaultSessions, metricsPort=0):
+        self.path = path
+        self.metricsPort = metricsPort
+        self.metrics = calcmetrics.MetricsRegistry()
+        self.shard = self.metrics.newShard()    # updated on the event loop
+        self.pool = SessionPool(self.metrics, numSessions)
+        self.server = None
+        self.numConnections = 0
+        self.describeMetrics()
+
+    def describeMetrics(self):
+        """Add the metric descriptions and gauges.
+        """
+        self.metrics.describe('rpcalc_requests_total', 'counter',
+                              'Requests answered, by status.')
+        self.metrics.describe('rpcalc_request_duration_seconds', 'histogram',
+                              'Request time, including waiting for a '
+                              'session.')
+        self.metrics.describe('rpcalc_command_duration_seconds', 'histogram',
+                              'Time to run each command in a session.')
+        self.metrics.describe('rpcalc_option_changes_total', 'counter',
+                              'Settings changed by requests, which are '
+                              'dropped after each request.')
+        self.metrics.addGauge('rpcalc_sessions', 'Sessions in the pool.',
+                              lambda: len(self.pool.sessions))
+        self.metrics.addGauge('rpcalc_sessions_busy',
+                              'Sessions running a request.',
+                              self.pool.numBusy)
+        self.metrics.addGauge('rpcalc_queue_depth',
+                              'Requests waiting for a free session.',
+                              lambda: self.pool.numWaiting)
+        self.metrics.addGauge('rpcalc_connections',
+                              'Open client connections.',
+                              lambda: self.numConnections)
+
+    async def handleClient(self, reader, writer):
+        """Answer requests from one connection until it closes.
+        """
+        self.numConnections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                if line.startswith(b'GET '):
+                    await self.answerHttp(line, reader, writer)
+                    break
+                writer.write(await self.handleRequest(line))
+                await writer.drain()
+        except (ConnectionError, ValueError):   # ValueError for long lines
+            pass
+        finally:
+            self.numConnections -= 1
+            writer.close()
+
+    async def handleRequest(self, line):
+        """Return the encoded response line for a request line.
+
+        Results that are not finite can't be sent as JSON, so they are
+        answered with an error message.
+        """
+        startTime = time.perf_counter_ns()
+        requestId = None
+        try:
+            requestId, cmds, stack = parseRequest(line)
+            response = await self.pool.run(cmds, stack)
+            status = 'cmd_error' if response['error'] else 'ok'
+            response['id'] = requestId
+        except RequestError as err:
+            response = {'id': err.requestId, 'error': {'message': str(err)}}
+            status = 'bad_request'
+        except Exception as err:    # keep serving after a failed command
+            print('Error - request failed:', repr(err))
+            response = {'id': requestId,
+                        'error': {'message': 'internal error'}}
+            status = 'internal_error'
+        try:
+            data = json.dumps(response, allow_nan=False)
+        except ValueError:
+            response = {'id': requestId,
+                        'error': {'message': 'result is not a finite number'}}
+            data = json.dumps(response)
+            status = 'cmd_error'
+        self.shard.count('rpcalc_requests_total', (('status', status),))
+        self.shard.observe('rpcalc_request_duration_seconds', (),
+                           time.perf_counter_ns() - startTime)
+        return data.encode('utf-8') + b'\n'
+
+    async def answerHttp(self, requestLine, reader, writer):
+        """Answer an HTTP GET request with the metrics.
+        """
+        while (await reader.readline()).strip():
+            pass     # skip the headers
+        parts = requestLine.split()
+        path = parts[1].split(b'?')[0] if len(parts) > 1 else b''
+        if path in (b'/', b'/metrics'):
+            status, body = '200 OK', self.metrics.render()
+        else:
+            status, body = '404 Not Found', 'Not found\n'
+        data = body.encode('utf-8')
+        writer.write('HTTP/1.0 {0}\r\n'
+                     'Content-Type: text/plain; version=0.0.4; '
+                     'charset=utf-8\r\n'
+                     'Content-Length: {1}\r\n'
+                     'Connection: close\r\n\r\n'.format(status, len(data)).
+                     encode('ascii') + data)
+        await writer.drain()
+
+    async def handleHttpClient(self, reader, writer):
+        """Answer one metrics request on the localhost HTTP port.
+        """
+        try:
+            line = await reader.readline()
+            if line.startswith(b'GET '):
+                await self.answerHttp(line, reader, writer)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def removeStaleSocket(self):
+        """Remove a socket file left by a server that is no longer running.
+
+        Raises OSError if a server is running or the path is another file.
+        """
+        if not os.path.exists(self.path):
+            return
+        if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+            raise OSError('{0} is not a socket'.format(self.path))
+        testSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            testSocket.connect(self.path)
+        except OSError:
+            os.remove(self.path)
+            return
+        finally:
+            testSocket.close()
+        raise OSError('a server is already running on {0}'.format(self.path))
+
+    async def serveForever(self):
+        """Listen on the socket until canceled or stopped by a signal.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        for signalNum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signalNum, task.cancel)
+        self.removeStaleSocket()
+        self.pool.start()
+        httpServer = None
+        if self.metricsPort:
+            httpServer = await asyncio.start_server(self.handleHttpClient,
+                                                    '127.0.0.1',
+                                                    self.metricsPort)
+        # the socket is only for the user's own tools, so it is created
+        # without group and other access before it starts listening
+        oldUmask = os.umask(0o177)
+        try:
+            self.server = await asyncio.start_unix_server(self.handleClient,
+                                                          self.path,
+                                                          limit=maxLineLength)
+        finally:
+            os.umask(oldUmask)
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            if httpServer:
+                httpServer.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        """Stop the sessions after the event loop is done.
+        """
+        self.pool.close()
+
+
+def serve(path='', numSessions=defaultSessions, metricsPort=0):
+    """Run a server on path until interrupted.
+
+    Metrics are also served on the localhost HTTP port if given.
+    """
+    server = CalcServer(path or defaultPath(), numSessions, metricsPort)
+    print('rpCalc serving on', server.path)
+    if metricsPort:
+        print('Metrics on http://127.0.0.1:{0}/metrics'.format(metricsPort))
+    try:
+        asyncio.run(server.serveForever())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except OSError as err:
+        print('Error - could not start server,', err)
+    finally:
+        server.close()
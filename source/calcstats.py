@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# calcstats.py, provides streaming accumulators for the statistics registers
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import math
+
+
+class KahanSum:
+    """Running sum with compensation for lost low-order bits.
+    """
+    def __init__(self):
+        self.total = 0.0
+        self.comp = 0.0
+
+    def add(self, num):
+        """Add num to the running total.
+        """
+        y = num - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+    def copy(self):
+        """Return an independent copy.
+        """
+        kahanSum = KahanSum()
+        kahanSum.total = self.total
+        kahanSum.comp = self.comp
+        return kahanSum
+
+
+class QuantileSketch:
+    """Merging t-digest for approximate quantiles in bounded memory.
+
+    Larger compression values keep more centroids for better accuracy.
+    """
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.buffer = []
+        self.count = 0
+        self.minVal = math.inf
+        self.maxVal = -math.inf
+
+    def copy(self):
+        """Return an independent copy.
+        """
+        sketch = QuantileSketch(self.compression)
+        sketch.means = self.means[:]
+        sketch.weights = self.weights[:]
+        sketch.buffer = self.buffer[:]
+        sketch.count = self.count
+        sketch.minVal = self.minVal
+        sketch.maxVal = self.maxVal
+        return sketch
+
+    def add(self, num):
+        """Add a value to the sketch.
+        """
+        self.buffer.append(num)
+        self.count += 1
+        if num < self.minVal:
+            self.minVal = num
+        if num > self.maxVal:
+            self.maxVal = num
+        if len(self.buffer) >= 5 * self.compression:
+            self.compress()
+
+    def addValues(self, values):
+        """Add a list of values to the sketch.
+        """
+        if not values:
+            return
+        self.buffer.extend(values)
+        self.count += len(values)
+        self.minVal = min(self.minVal, min(values))
+        self.maxVal = max(self.maxVal, max(values))
+        if len(self.buffer) >= 5 * self.compression:
+            self.compress()
+
+    def scale(self, q):
+        """Return the k1 scale function value for quantile q.
+        """
+        return self.compression * math.asin(2.0 * q - 1.0) / (2.0 * math.pi)
+
+    def scaleInverse(self, k):
+        """Return the quantile for k1 scale value k.
+        """
+        if k >= self.compression / 4.0:
+            return 1.0
+        return (math.sin(2.0 * math.pi * k / self.compression) + 1.0) / 2.0
+
+    def compress(self):
+        """Merge the buffered values into the centroid list.
+        """
+        if not self.buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) +
+                        [(num, 1.0) for num in self.buffer])
+        self.buffer = []
+        total = float(self.count)
+        newMeans = []
+        newWeights = []
+        curMean, curWeight = points[0]
+        weightSoFar = 0.0
+        weightLimit = total * self.scaleInverse(self.scale(0.0) + 1.0)
+        for mean, weight in points[1:]:
+            if weightSoFar + curWeight + weight <= weightLimit:
+                curWeight += weight
+                curMean += (mean - curMean) * weight / curWeight
+            else:
+                weightSoFar += curWeight
+                newMeans.append(curMean)
+                newWeights.append(curWeight)
+                weightLimit = total * self.scaleInverse(self.
+                                                        scale(weightSoFar /
+                                                              total) + 1.0)
+                curMean, curWeight = mean, weight
+        newMeans.append(curMean)
+        newWeights.append(curWeight)
+        self.means = newMeans
+        self.weights = newWeights
+
+    def quantile(self, q):
+        """Return the estimated value at quantile q (0.0 to 1.0).
+        """
+        if not self.count:
+            raise ZeroDivisionError
+        if not 0.0 <= q <= 1.0:
+            raise ValueError
+        self.compress()
+        target = q * self.count
+        prevPos = 0.0
+        prevMean = self.minVal
+        cumWeight = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            pos = cumWeight + weight / 2.0
+            if target < pos:
+                return self.interpolate(target, prevPos, prevMean, pos, mean)
+            prevPos = pos
+            prevMean = mean
+            cumWeight += weight
+        return self.interpolate(target, prevPos, prevMean, self.count,
+                                self.maxVal)
+
+    def cdf(self, num):
+        """Return the estimated fraction of values at or below num.
+        """
+        if not self.count:
+            return 0.0
+        self.compress()
+        if num < self.minVal:
+            return 0.0
+        if num >= self.maxVal:
+            return 1.0
+        prevPos = 0.0
+        prevMean = self.minVal
+        cumWeight = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            pos = cumWeight + weight / 2.0
+            if num < mean:
+                return self.interpolate(num, prevMean, prevPos, mean,
+                                        pos) / self.count
+            prevPos = pos
+            prevMean = mean
+            cumWeight += weight
+        return self.interpolate(num, prevMean, prevPos, self.maxVal,
+                                self.count) / self.count
+
+    @staticmethod
+    def interpolate(x, x0, y0, x1, y1):
+        """Return linear interpolation at x between points 0 and 1.
+        """
+        if x1 <= x0:
+            return y1
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+
+class StatRegister:
+    """HP-style statistics registers for x,y data pairs.
+
+    Uses Welford updates for the means and co-moments, compensated sums
+    for the totals and t-digest sketches of x for quantiles, so no
+    per-point data is kept.
+    """
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.clear()
+
+    def clear(self):
+        """Reset all accumulators.
+        """
+        self.count = 0
+        self.meanX = 0.0
+        self.meanY = 0.0
+        self.m2X = 0.0     # sum of squared deviations from mean
+        self.m2Y = 0.0
+        self.coXY = 0.0    # sum of products of x and y deviations
+        self.sumX = KahanSum()
+        self.sumY = KahanSum()
+        self.sumX2 = KahanSum()
+        self.sumY2 = KahanSum()
+        self.sumXY = KahanSum()
+        self.sketch = QuantileSketch(self.compression)
+        self.removedSketch = QuantileSketch(self.compression)
+
+    def copy(self):
+        """Return an independent copy of all accumulators.
+        """
+        stat = StatRegister.__new__(StatRegister)
+        stat.__dict__.update(self.__dict__)
+        for name in ('sumX', 'sumY', 'sumX2', 'sumY2', 'sumXY', 'sketch',
+                     'removedSketch'):
+            setattr(stat, name, getattr(self, name).copy())
+        return stat
+
+    def setCompression(self, compression):
+        """Set the quantile sketch accuracy for future merges.
+        """
+        self.compression = compression
+        self.sketch.compression = compression
+        self.removedSketch.compression = compression
+
+    def addPoint(self, x, y=0.0):
+        """Add a data point.
+        """
+        self.count += 1
+        dx = x - self.meanX
+        self.meanX += dx / self.count
+        dy = y - self.meanY
+        self.meanY += dy / self.count
+        self.m2X += dx * (x - self.meanX)
+        self.m2Y += dy * (y - self.meanY)
+        self.coXY += dx * (y - self.meanY)
+        self.updateSums(x, y, 1.0)
+        self.sketch.add(x)
+
+    def addValues(self, xValues):
+        """Add a list of x values (with zero y values) in one update.
+
+        Merges the batch's mean and squared deviations using the pairwise
+        update for combining two data sets.
+        """
+        batchCount = len(xValues)
+        if not batchCount:
+            return
+        batchSum = math.fsum(xValues)
+        batchMean = batchSum / batchCount
+        batchM2 = math.fsum((x - batchMean) ** 2 for x in xValues)
+        total = self.count + batchCount
+        dx = batchMean - self.meanX
+        dy = -self.meanY
+        weight = self.count * batchCount / total
+        self.meanX += dx * batchCount / total
+        self.meanY += dy * batchCount / total
+        self.m2X += batchM2 + dx * dx * weight
+        self.m2Y += dy * dy * weight
+        self.coXY += dx * dy * weight
+        self.count = total
+        self.sumX.add(batchSum)
+        self.sumX2.add(math.fsum(x * x for x in xValues))
+        self.sketch.addValues(xValues)
+
+    def removePoint(self, x, y=0.0):
+        """Remove a previously added data point.
+        """
+        if self.count <= 1:
+            self.clear()
+            return
+        self.count -= 1
+        oldMeanX = self.meanX
+        oldMeanY = self.meanY
+        self.meanX = (self.meanX * (self.count + 1) - x) / self.count
+        self.meanY = (self.meanY * (self.count + 1) - y) / self.count
+        self.m2X = max(self.m2X - (x - self.meanX) * (x - oldMeanX), 0.0)
+        self.m2Y = max(self.m2Y - (y - self.meanY) * (y - oldMeanY), 0.0)
+        self.coXY -= (x - self.meanX) * (y - oldMeanY)
+        self.updateSums(x, y, -1.0)
+        self.removedSketch.add(x)
+
+    def updateSums(self, x, y, sign):
+        """Add or subtract (based on sign) a point from the totals.
+        """
+        self.sumX.add(sign * x)
+        self.sumY.add(sign * y)
+        self.sumX2.add(sign * x * x)
+        self.sumY2.add(sign * y * y)
+        self.sumXY.add(sign * x * y)
+
+    def means(self):
+        """Return a tuple of the x and y means.
+        """
+        if not self.count:
+            raise ZeroDivisionError
+        return (self.meanX, self.meanY)
+
+    def stdDevs(self):
+        """Return a tuple of the x and y sample standard deviations.
+        """
+        if self.count < 2:
+            raise ZeroDivisionError
+        return (math.sqrt(self.m2X / (self.count - 1)),
+                math.sqrt(self.m2Y / (self.count - 1)))
+
+    def linReg(self):
+        """Return a tuple of the y-intercept and slope of the linear fit.
+        """
+        if self.count < 2:
+            raise ZeroDivisionError
+        slope = self.coXY / self.m2X
+        return (self.meanY - slope * self.meanX, slope)
+
+    def correlation(self):
+        """Return the correlation coefficient of the x and y data.
+        """
+        if self.count < 2:
+            raise ZeroDivisionError
+        return self.coXY / math.sqrt(self.m2X * self.m2Y)
+
+    def estimateY(self, x):
+        """Return the y value estimated by the linear fit at x.
+        """
+        intercept, slope = self.linReg()
+        return intercept + slope * x
+
+    def quantile(self, q):
+        """Return the estimated x value at quantile q (0.0 to 1.0).
+
+        Removed points are subtracted from the distribution of the added
+        points, using a bisection search of the difference.
+        """
+        if not self.count:
+            raise ZeroDivisionError
+        if not self.removedSketch.count:
+            return self.sketch.quantile(q)
+        if not 0.0 <= q <= 1.0:
+            raise ValueError
+        target = q * self.count
+        low = self.sketch.minVal
+        high = self.sketch.maxVal
+        for i in range(100):
+            mid = (low + high) / 2.0
+            if mid in (low, high):
+                break
+            netCount = (self.sketch.cdf(mid) * self.sketch.count -
+                        self.removedSketch.cdf(mid) *
+                        self.removedSketch.count)
+            if netCount < target:
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2.0
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# calcworker.py, runs slow commands on a background thread
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import time
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class Cancelled(Exception):
+    """Raised inside a job's function after the job is canceled.
+    """
+    pass
+
+
+class Job:
+    """A function to run on the worker thread, with one to apply its result.
+
+    The result function is called on the GUI thread with the result and
+    returns a status message.
+    """
+    def __init__(self, text, resultFunc):
+        self.text = text
+        self.resultFunc = resultFunc
+        self.func = None
+        self.args = ()
+        self.result = None
+        self.error = None
+        self.elapsed = 0.0
+        self.cancelEvent = threading.Event()
+
+    def setTask(self, func, *args):
+        """Set the function and arguments to run on the worker thread.
+        """
+        self.func = func
+        self.args = args
+
+    def cancellable(self, func):
+        """Return func wrapped to stop the job at its next call if canceled.
+        """
+        def checkedFunc(*args):
+            if self.cancelEvent.is_set():
+                raise Cancelled
+            return func(*args)
+        return checkedFunc
+
+    def run(self):
+        """Call the function and keep its result or error.
+
+        Unexpected errors, such as from plugins or user functions, are
+        kept and shown like calculator errors.
+        """
+        startTime = time.perf_counter()
+        try:
+            self.result = self.func(*self.args)
+        except Cancelled:
+            pass
+        except (ValueError, ZeroDivisionError, OverflowError) as err:
+            self.error = err
+        except Exception as err:
+            print('Error - {0} failed: {1!r}'.format(self.text, err))
+            self.error = err
+        finally:
+            self.elapsed = time.perf_counter() - startTime
+
+
+class CalcWorker(QObject):
+    """Runs one job at a time on a background thread.
+
+    Python threads can't be stopped, so a canceled job is left to finish
+    and its result is dropped.  Jobs must only change copies of the
+    calculator state, which the result function applies in one step.
+    Command run times are kept to estimate which commands are slow.
+    """
+    jobDone = pyqtSignal(object)        # sent from the worker thread
+    jobFinished = pyqtSignal(object)    # sent for jobs not canceled
+    slowTime = 0.05    # seconds, commands slower than this use a thread
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self.job = None
+        self.cmdTimes = {}    # command name -> last run time in seconds
+        self.jobDone.connect(self.finishJob)
+
+    def busy(self):
+        """Return True if a job is running.
+        """
+        return self.job is not None
+
+    def start(self, job):
+        """Start running a job on a new thread.
+        """
+        self.job = job
+        thread = threading.Thread(target=self.runJob, args=(job,),
+                                  daemon=True)
+        thread.start()
+
+    def runJob(self, job):
+        """Run the job, called on the worker thread.
+
+        The signal is queued to the GUI thread, and is always sent so the
+        worker is never left busy.
+        """
+        try:
+            job.run()
+        finally:
+            self.jobDone.emit(job)
+
+    def finishJob(self, job):
+        """Clear the finished job and pass it on unless it was canceled.
+        """
+        if job is self.job:
+            self.job = None
+            self.jobFinished.emit(job)
+
+    def cancel(self):
+        """Cancel the running job, return True if there was one.
+        """
+        job = self.job
+        if not job:
+            return False
+        job.cancelEvent.set()
+        self.job = None
+        return True
+
+    def isSlow(self, cmdStr, calc):
+        """Return True if a core command should run on the worker thread.
+
+        User functions and plugin commands run there until they are timed,
+        other commands only if they have been slow.
+        """
+        runTime = self.cmdTimes.get(cmdStr)
+        if runTime is None:
+            return cmdStr in calc.userFuncs or cmdStr in calc.plugins.commands
+        return runTime > CalcWorker.slowTime
+
+    def recordTime(self, cmdStr, runTime):
+        """Store the run time of a command for estimates.
+        """
+        self.cmdTimes[cmdStr] = runTime
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# cmdtrie.py, provides a prefix tree of command names for typed commands
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+# number of best ranked names kept on each node for candidate lists
+rankSize = 8
+
+def conflictingName(name, names):
+    """Return a name from names that name equals, starts or starts with.
+
+    Typed commands run as soon as they match, so such names can't both be
+    typed.  Returns '' if there is no conflict.
+    """
+    for other in names:
+        if other.startswith(name) or name.startswith(other):
+            return other
+    return ''
+
+
+class TrieNode:
+    """One character position in the command trie.
+    """
+    __slots__ = ('children', 'name', 'count', 'uses', 'ranked')
+    def __init__(self):
+        self.children = {}   # character -> TrieNode
+        self.name = None     # full command name if one ends here
+        self.count = 0       # number of names in this subtree
+        self.uses = 0        # times the name ending here was used
+        self.ranked = []     # best ranked name nodes in this subtree
+
+    def rankKey(self):
+        """Return the sort key for a name node, most used and shortest first.
+        """
+        return (-self.uses, len(self.name), self.name)
+
+    def updateRank(self, nameNode):
+        """Add or move a name node from this subtree in the ranked list.
+
+        Ranks only rise, so names dropped from the list never need to be
+        found again until their own use count changes.
+        """
+        if nameNode not in self.ranked:
+            if len(self.ranked) >= rankSize and \
+                    nameNode.rankKey() >= self.ranked[-1].rankKey():
+                return
+            self.ranked.append(nameNode)
+        self.ranked.sort(key=TrieNode.rankKey)
+        del self.ranked[rankSize:]
+
+
+class CommandTrie:
+    """Stores command names for prefix checks and completion.
+
+    Lookups and candidate lists take time proportional to the prefix
+    length, not the number of commands.
+    """
+    def __init__(self, names=()):
+        self.root = TrieNode()
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """Add a command name, ignored if already present.
+        """
+        if self.isCommand(name):
+            return
+        node = self.root
+        path = [node]
+        for char in name:
+            child = node.children.get(char)
+            if not child:
+                child = node.children[char] = TrieNode()
+            node = child
+            path.append(node)
+        node.name = name
+        for pathNode in path:
+            pathNode.count += 1
+            pathNode.updateRank(node)
+
+    def findNode(self, prefix):
+        """Return the node for prefix, or None if no names start with it.
+        """
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if not node:
+                return None
+        return node
+
+    def hasPrefix(self, prefix):
+        """Return True if any command starts with prefix.
+        """
+        return self.findNode(prefix) is not None
+
+    def isCommand(self, name):
+        """Return True if name is a complete command.
+        """
+        node = self.findNode(name)
+        return node is not None and node.name is not None
+
+    def completion(self, prefix):
+        """Return the only command starting with prefix, or None.
+        """
+        node = self.findNode(prefix)
+        if not node or node.count != 1:
+            return None
+        while node.name is None:
+            node = next(iter(node.children.values()))
+        return node.name
+
+    def commonPrefix(self, prefix):
+        """Return the longest prefix shared by all commands starting with it.
+        """
+        node = self.findNode(prefix)
+        if not node:
+            return prefix
+        while node.name is None and len(node.children) == 1:
+            char, node = next(iter(node.children.items()))
+            prefix += char
+        return prefix
+
+    def addUse(self, name):
+        """Count a use of name for ranking candidates.
+        """
+        node = self.findNode(name)
+        if not node or node.name is None:
+            return
+        node.uses += 1
+        pathNode = self.root
+        pathNode.updateRank(node)
+        for char in name:
+            pathNode = pathNode.children[char]
+            pathNode.updateRank(node)
+
+    def candidates(self, prefix, maxNum=5):
+        """Return up to maxNum commands starting with prefix.
+
+        The most used commands come first, then shorter names.  Lists up
+        to rankSize long are read from the node without a search.
+        """
+        node = self.findNode(prefix)
+        if not node:
+            return []
+        if maxNum <= rankSize:
+            return [nameNode.name for nameNode in node.ranked[:maxNum]]
+        found = []
+        nodes = [node]
+        while nodes:
+            node = nodes.pop()
+            if node.name is not None:
+                found.append(node)
+            nodes.extend(node.children.values())
+        found.sort(key=lambda node: (-node.uses, len(node.name), node.name))
+        return [node.name for node in found[:maxNum]]
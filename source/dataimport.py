@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# dataimport.py, provides chunked reading of data columns from files
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import mmap
+import array
+import os.path
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class DataImporter:
+    """Reads one column of numbers from a memory-mapped file in chunks.
+
+    The file type is 'csv' for delimited text (the delimiter is detected
+    from the first line), 'f64' or 'f32' for raw little-endian floats with
+    numColumns values per record.  Column numbers start at zero.
+    """
+    binaryTypes = {'f64': 'd', 'f32': 'f'}
+    numpyTypes = {'f64': '<f8', 'f32': '<f4'}
+    def __init__(self, path, column=0, fileType='csv', numColumns=1,
+                 chunkSize=1 << 22):
+        self.path = path
+        self.column = column
+        self.fileType = fileType
+        self.numColumns = numColumns
+        self.chunkSize = chunkSize
+        self.fileSize = os.path.getsize(path)
+
+    @staticmethod
+    def typeFromPath(path):
+        """Return a file type guessed from the path extension.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext in ('.f64', '.bin', '.dat'):
+            return 'f64'
+        if ext == '.f32':
+            return 'f32'
+        return 'csv'
+
+    def chunks(self, progressFunc=None):
+        """Yield lists of the column values from each chunk of the file.
+
+        progressFunc is called with bytes done and total bytes, and reading
+        stops if it returns False.
+        """
+        if not self.fileSize:
+            return
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if self.fileType in DataImporter.binaryTypes:
+                    reader = self.binaryChunks(mm)
+                else:
+                    reader = self.textChunks(mm)
+                try:
+                    for values, pos in reader:
+                        yield values
+                        if progressFunc and not progressFunc(pos,
+                                                             self.fileSize):
+                            return
+                finally:
+                    reader.close()   # release buffers before unmapping
+
+    def textChunks(self, mm):
+        """Yield value lists and end positions from delimited text.
+        """
+        lineEnd = mm.find(b'\n')
+        firstLine = mm[:lineEnd] if lineEnd >= 0 else mm[:]
+        delimiter = None    # whitespace
+        for char in (b',', b'\t', b';'):
+            if char in firstLine:
+                delimiter = char
+                break
+        pos = 0
+        while pos < self.fileSize:
+            end = mm.find(b'\n', pos + self.chunkSize)
+            end = self.fileSize if end < 0 else end + 1
+            values = []
+            for line in mm[pos:end].split(b'\n'):
+                fields = line.split(delimiter)
+                try:
+                    values.append(float(fields[self.column]))
+                except (IndexError, ValueError):
+                    pass    # skip headers and blank or short lines
+            pos = end
+            yield values, pos
+
+    def binaryChunks(self, mm):
+        """Yield value lists and end positions from raw binary floats.
+
+        The memory map is read in place on little-endian hosts, and copied
+        to swap the bytes on others.
+        """
+        typeCode = DataImporter.binaryTypes[self.fileType]
+        itemSize = array.array(typeCode).itemsize
+        recordSize = itemSize * self.numColumns
+        numRecords = self.fileSize // recordSize
+        chunkRecords = max(self.chunkSize // recordSize, 1)
+        swapBytes = sys.byteorder != 'little'
+        view = memoryview(mm)
+        try:
+            for start in range(0, numRecords, chunkRecords):
+                end = min(start + chunkRecords, numRecords)
+                chunkBytes = view[start * recordSize:end * recordSize]
+                if swapBytes:
+                    chunk = array.array(typeCode)
+                    chunk.frombytes(chunkBytes)
+                    chunk.byteswap()
+                else:
+                    chunk = chunkBytes.cast(typeCode)
+                values = chunk[self.column::self.numColumns].tolist()
+                if not swapBytes:
+                    chunk.release()
+                chunkBytes.release()
+                yield values, end * recordSize
+        finally:
+            view.release()
+
+    def dataArray(self):
+        """Return a read-only NumPy view of a binary column without copying.
+
+        Returns None if NumPy is not available or the file is not binary.
+        """
+        if numpy is None or self.fileType not in DataImporter.numpyTypes:
+            return None
+        dataType = numpy.dtype(DataImporter.numpyTypes[self.fileType])
+        numItems = self.fileSize // dataType.itemsize
+        if numItems < self.numColumns:
+            return numpy.zeros(0)     # memmap can't map an empty file
+        data = numpy.memmap(self.path, dtype=dataType, mode='r',
+                            shape=(numItems,))
+        numRecords = numItems // self.numColumns
+        data = data[:numRecords * self.numColumns]
+        return data.reshape(numRecords, self.numColumns)[:, self.column]
+
+
+class DataRegister:
+    """Stores an imported data column, using NumPy if it is available.
+    """
+    def __init__(self):
+        self.data = None
+        self.parts = []
+
+    def extend(self, values):
+        """Add a chunk of values.
+        """
+        if numpy is not None:
+            self.parts.append(numpy.array(values, dtype=float))
+        else:
+            if self.data is None:
+                self.data = array.array('d')
+            self.data.extend(values)
+
+    def setArray(self, data):
+        """Use an existing array (such as a memory-mapped view) as the data.
+        """
+        self.data = data
+        self.parts = []
+
+    def finish(self):
+        """Join any chunks added with NumPy.
+        """
+        if self.parts:
+            self.data = numpy.concatenate(self.parts)
+            self.parts = []
+
+    def copy(self):
+        """Return a register with the same finished data.
+
+        Commands only read the data, so it is shared rather than copied.
+        """
+        dataReg = DataRegister()
+        dataReg.data = self.data
+        return dataReg
+
+    def __len__(self):
+        return len(self.data) if self.data is not None else 0
+
+    def __getitem__(self, index):
+        return float(self.data[index])
+
+
+if __name__ == '__main__':
+    # check that binary files read the same with chunks and with NumPy
+    import tempfile
+    import struct
+    values = [float(i) * 0.5 for i in range(10)]
+    for fileType in DataImporter.binaryTypes:
+        with tempfile.NamedTemporaryFile(suffix='.' + fileType,
+                                         delete=False) as f:
+            f.write(struct.pack('<{0}{1}'.
+                                format(len(values),
+                                       DataImporter.binaryTypes[fileType]),
+                                *values))
+            f.write(b'\0')    # partial record is ignored
+        try:
+            importer = DataImporter(f.name, 1, fileType, 2)
+            chunkValues = [num for chunk in importer.chunks()
+                           for num in chunk]
+            assert chunkValues == values[1::2], chunkValues
+            columnData = importer.dataArray()
+            if columnData is not None:
+                assert columnData.tolist() == values[1::2], columnData
+                del columnData    # release the map before removing
+            print(fileType, 'import ok',
+                  'with NumPy' if numpy else 'without NumPy')
+        finally:
+            os.remove(f.name)
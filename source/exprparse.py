@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# exprparse.py, compiles algebraic expressions to RPN command tokens
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import re
+import math
+import functools
+
+tokenRe = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)'
+                     r'|([A-Za-z_][A-Za-z0-9_]*)|(\*\*|[-+*/^(),]))')
+stackSize = 4
+# binary operators: binding power, right associative, command, commutative
+binaryOps = {'+': (10, False, '+', True),
+             '-': (10, False, '-', False),
+             '*': (20, False, '*', True),
+             '/': (20, False, '/', False),
+             '^': (30, True, 'Y^X', False),
+             '**': (30, True, 'Y^X', False)}
+unaryPower = 25    # binds tighter than * but looser than ^, so -2^2 is -4
+# function names that differ from the command names, with argument counts
+functionCmds = {'sqrt': ('SQRT', 1), 'sin': ('SIN', 1), 'cos': ('COS', 1),
+                'tan': ('TAN', 1), 'asin': ('ASIN', 1), 'acos': ('ACOS', 1),
+                'atan': ('ATAN', 1), 'ln': ('LN', 1), 'log': ('LOG', 1),
+                'exp': ('E^X', 1), 'sqr': ('X^2', 1), 'inv': ('RCIP', 1),
+                'alog': ('TN^X', 1), 'pow': ('Y^X', 2), 'root': ('XRT', 2)}
+constants = {'pi': math.pi, 'e': math.e}
+# commands whose operands can be swapped without an exchange, any others
+# (including user functions and plugins) keep their order
+commutativeCmds = ('+', '*')
+
+
+class ExprError(ValueError):
+    """Expression syntax error with the position in the text.
+    """
+    def __init__(self, msg, pos):
+        ValueError.__init__(self, msg)
+        self.pos = pos
+
+
+class Node:
+    """Parsed expression element - a number or a command with arguments.
+    """
+    __slots__ = ('pos', 'token', 'num', 'args', 'depth')
+    def __init__(self, pos, token, num=None, args=()):
+        self.pos = pos
+        self.token = token
+        self.num = num
+        self.args = args
+        self.depth = 1    # registers needed to evaluate
+        if len(args) == 2:
+            left, right = (arg.depth for arg in args)
+            self.depth = max(left, right + 1) if left >= right else \
+                         max(right, left + 1)
+        elif args:
+            self.depth = max(arg.depth + i for i, arg in enumerate(args))
+
+
+class Parser:
+    """Pratt parser for one expression.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.tokens = []    # (position, kind, text)
+        pos = 0
+        while pos < len(text):
+            match = tokenRe.match(text, pos)
+            if not match:
+                if text[pos:].isspace():
+                    break
+                raise ExprError('unexpected character', pos)
+            for kind in (1, 2, 3):
+                if match.group(kind):
+                    self.tokens.append((match.start(kind), kind,
+                                        match.group(kind)))
+            pos = match.end()
+        self.tokens.append((len(text), 0, ''))
+        self.index = 0
+
+    def next(self):
+        """Return and move past the current token.
+        """
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, text):
+        """Move past a required symbol.
+        """
+        pos, kind, tokenText = self.next()
+        if tokenText != text:
+            raise ExprError('expected "{0}"'.format(text), pos)
+
+    def parse(self, minPower=0):
+        """Return the node for an expression with operators above minPower.
+        """
+        pos, kind, text = self.next()
+        if kind == 1:
+            left = Node(pos, text, float(text))
+        elif kind == 2:
+            left = self.parseName(pos, text)
+        elif text == '(':
+            left = self.parse()
+            self.expect(')')
+        elif text == '-':
+            arg = self.parse(unaryPower)
+            if arg.num is not None:
+                left = Node(pos, repr(-arg.num), -arg.num)
+            else:
+                left = Node(pos, '*', args=(arg, Node(pos, '-1.0', -1.0)))
+        elif text == '+':
+            left = self.parse(unaryPower)
+        else:
+            raise ExprError('expected a number, name or "("', pos)
+        while True:
+            pos, kind, text = self.tokens[self.index]
+            opInfo = binaryOps.get(text) if kind == 3 else None
+            if not opInfo or opInfo[0] <= minPower:
+                return left
+            self.index += 1
+            power, rightAssoc, cmd, commutative = opInfo
+            right = self.parse(power - 1 if rightAssoc else power)
+            left = Node(pos, cmd, args=(left, right))
+
+    def parseName(self, pos, name):
+        """Return the node for a constant or a function call.
+        """
+        if self.tokens[self.index][2] != '(':
+            num = constants.get(name.lower())
+            if num is None:
+                raise ExprError('unknown name "{0}"'.format(name), pos)
+            return Node(pos, repr(num), num)
+        self.index += 1
+        args = []
+        if self.tokens[self.index][2] != ')':
+            args.append(self.parse())
+            while self.tokens[self.index][2] == ',':
+                self.index += 1
+                args.append(self.parse())
+        self.expect(')')
+        cmd, numArgs = functionCmds.get(name.lower(),
+                                        (name.upper(), len(args)))
+        if len(args) != numArgs:
+            raise ExprError('{0} needs {1} argument{2}'.
+                            format(name, numArgs, 's' if numArgs > 1 else ''),
+                            pos)
+        return Node(pos, cmd, args=tuple(args))
+
+
+def emit(node, ops):
+    """Append the RPN tokens for node to ops, deepest operand first.
+
+    Operands of binary commands are swapped when the right one needs more
+    registers, adding an exchange unless the command is known to be
+    commutative.
+    """
+    if len(node.args) == 2 and node.args[1].depth > node.args[0].depth:
+        emit(node.args[1], ops)
+        emit(node.args[0], ops)
+        if node.token not in commutativeCmds:
+            ops.append((node.pos, 'X<>Y', None))
+    else:
+        for arg in node.args:
+            emit(arg, ops)
+    ops.append((node.pos, node.token, node.num))
+
+@functools.lru_cache(maxsize=256)
+def compileExpr(text):
+    """Return a tuple of (position, token, number) ops for the expression.
+
+    Uses the same format as CalcCore.compileTokens.  Raises ExprError for
+    syntax errors or expressions that need more than the four registers.
+    """
+    parser = Parser(text)
+    node = parser.parse()
+    pos, kind, tokenText = parser.tokens[parser.index]
+    if kind:
+        raise ExprError('unexpected "{0}"'.format(tokenText), pos)
+    if node.depth > stackSize:
+        raise ExprError('too many nested operations for the stack', 0)
+    ops = []
+    emit(node, ops)
+    return tuple(ops)
@@ -12,11 +12,15 @@
 # but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
 #*****************************************************************************
 
-from PyQt5.QtCore import Qt
+import math
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
 from PyQt5.QtGui import QClipboard
-from PyQt5.QtWidgets import (QApplication, QHBoxLayout, QListView, QPushButton,
-                             QTabWidget, QTreeWidget, QTreeWidgetItem,
-                             QVBoxLayout, QWidget)
+from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QFileDialog,
+                             QHBoxLayout, QHeaderView, QListView,
+                             QMessageBox, QProgressDialog, QPushButton,
+                             QTabWidget, QTableView, QTreeWidget,
+                             QTreeWidgetItem, QVBoxLayout, QWidget, qApp)
+from calccore import Event
 
 
 class ExtraViewWidget(QTreeWidget):
@@ -26,6 +30,12 @@ class ExtraViewWidget(QTreeWidget):
         QListView.__init__(self, parent)
         self.calcRef = calcRef
         self.setRootIsDecorated(False)
+        calcRef.addListener(self.calcChanged)
+
+    def calcChanged(self, event, data):
+        """Record a change event from the calculator core for the next update.
+        """
+        pass
 
     def setHeadings(self, headerLabels):
         """Add headings to columns.
@@ -46,14 +56,22 @@ class RegViewWidget(ExtraViewWidget):
             item.setTextAlignment(0, Qt.AlignCenter)
         self.resizeColumnToContents(0)
         self.setCurrentItem(item)
+        self.changedRegs = set(range(4))
         self.updateData()
 
+    def calcChanged(self, event, data):
+        """Record a change event from the calculator core for the next update.
+        """
+        if event == Event.regChange:
+            self.changedRegs.add(data)
+
     def updateData(self):
-        """Update with current data.
+        """Update rows for changed registers.
         """
-        for i in range(4):
-            self.topLevelItem(i).setText(1, '{:.15g}'.
-                                         format(self.calcRef.stack[3 - i]))
+        for i in self.changedRegs:
+            self.topLevelItem(3 - i).setText(1, '{:.15g}'.
+                                             format(self.calcRef.stack[i]))
+        self.changedRegs.clear()
 
     def selectedValue(self):
         """Return number for selected line.
@@ -70,26 +88,42 @@ class HistViewWidget(ExtraViewWidget):
     def __init__(self, calcRef, parent=None):
         ExtraViewWidget.__init__(self, calcRef, parent)
         self.setHeadings(['Equation', 'Value'])
+        self.numAdded = len(calcRef.history)  # pending changes
+        self.numDeleted = 0
+        self.reformat = False
         self.updateData()
 
+    def calcChanged(self, event, data):
+        """Record a change event from the calculator core for the next update.
+        """
+        if event == Event.histAdd:
+            self.numAdded += 1
+        elif event == Event.histDel:
+            self.numDeleted += data
+        elif event == Event.optChange:
+            self.reformat = True
+
     def updateData(self):
-        """Update with current data.
+        """Add and remove rows to match the history.
         """
-        if not self.calcRef.histChg:
-            return
-        maxLen = self.calcRef.option.intData('MaxHistLength',
-                                             self.calcRef.minMaxHist,
-                                             self.calcRef.maxMaxHist)
-        for eqn, value in self.calcRef.history[-self.calcRef.histChg:]:
-            item = QTreeWidgetItem(self,
-                                         [eqn, self.calcRef.formatNum(value)])
-            if self.topLevelItemCount() > maxLen:
-                self.takeTopLevelItem(0)
-        self.resizeColumnToContents(0)
-        self.clearSelection()
-        self.setCurrentItem(item)
-        self.scrollToItem(item)
-        self.calcRef.histChg = 0
+        numRowDel = min(self.numDeleted, self.topLevelItemCount())
+        for i in range(numRowDel):
+            self.takeTopLevelItem(0)
+        # deletions beyond the shown rows were for entries not yet added
+        numAdd = self.numAdded - (self.numDeleted - numRowDel)
+        if numAdd > 0:
+            for eqn, value in self.calcRef.history[-numAdd:]:
+                item = QTreeWidgetItem(self,
+                                       [eqn, self.calcRef.formatNum(value)])
+            self.resizeColumnToContents(0)
+            self.clearSelection()
+            self.setCurrentItem(item)
+            self.scrollToItem(item)
+        self.numAdded = self.numDeleted = 0
+        if self.reformat:
+            for i, (eqn, value) in enumerate(self.calcRef.history):
+                self.topLevelItem(i).setText(1, self.calcRef.formatNum(value))
+            self.reformat = False
 
     def selectedValue(self):
         """Return number for selected line.
@@ -112,14 +146,24 @@ class MemViewWidget(ExtraViewWidget):
             item.setTextAlignment(0, Qt.AlignCenter)
         self.resizeColumnToContents(0)
         self.setCurrentItem(self.topLevelItem(0))
+        self.changedMems = set(range(10))
         self.updateData()
 
+    def calcChanged(self, event, data):
+        """Record a change event from the calculator core for the next update.
+        """
+        if event == Event.memChange:
+            self.changedMems.add(data)
+        elif event == Event.optChange:
+            self.changedMems.update(range(10))
+
     def updateData(self):
-        """Update with current data.
+        """Update rows for changed memory registers.
         """
-        for i in range(10):
+        for i in self.changedMems:
             self.topLevelItem(i).setText(1, self.calcRef.
                                             formatNum(self.calcRef.mem[i]))
+        self.changedMems.clear()
 
     def selectedValue(self):
         """Return number for selected line.
@@ -130,8 +174,123 @@ class MemViewWidget(ExtraViewWidget):
         return 0.0
 
 
+class SweepModel(QAbstractTableModel):
+    """Table model that gets sweep results only for the rows shown.
+    """
+    def __init__(self, calcRef, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.calcRef = calcRef
+        self.sweep = None
+
+    def setSweep(self, sweep):
+        """Replace the sweep shown.
+        """
+        self.beginResetModel()
+        self.sweep = sweep
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        """Return the number of points.
+        """
+        if parent.isValid() or not self.sweep:
+            return 0
+        return self.sweep.numPoints
+
+    def columnCount(self, parent=QModelIndex()):
+        """Return 2 columns, for X and the result.
+        """
+        return 0 if parent.isValid() else 2
+
+    def value(self, index):
+        """Return the number at a model index.
+        """
+        if index.column() == 0:
+            return self.sweep.xValue(index.row())
+        return self.sweep.value(index.row())
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Return the formatted number at a model index.
+        """
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        num = self.value(index)
+        if not math.isfinite(num):
+            return 'error'
+        return self.calcRef.formatNum(num)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Return the column headings.
+        """
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return QAbstractTableModel.headerData(self, section, orientation,
+                                                  role)
+        if section == 0:
+            return 'X'
+        return self.sweep.name if self.sweep else 'Value'
+
+    def reformat(self):
+        """Signal views to update all numbers after an option change.
+        """
+        numRows = self.rowCount()
+        if numRows:
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(numRows - 1, 1))
+
+
+class SweepViewWidget(QTableView):
+    """Sweep results table view for ExtraDisplay.
+
+    Rows have a fixed height, so large sweeps scroll without calculating
+    the hidden rows.
+    """
+    def __init__(self, calcRef, parent=None):
+        QTableView.__init__(self, parent)
+        self.calcRef = calcRef
+        self.sweepModel = SweepModel(calcRef, self)
+        self.setModel(self.sweepModel)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.horizontalHeader().setStretchLastSection(True)
+        self.reformat = False
+        calcRef.addListener(self.calcChanged)
+
+    def calcChanged(self, event, data):
+        """Record a change event from the calculator core for the next update.
+        """
+        if event == Event.optChange:
+            self.reformat = True
+
+    def setSweep(self, sweep):
+        """Show a new sweep with its first result selected.
+        """
+        self.sweepModel.setSweep(sweep)
+        self.setCurrentIndex(self.sweepModel.index(0, 1))
+
+    def updateData(self):
+        """Reformat the numbers if options changed.
+        """
+        if self.reformat:
+            self.sweepModel.reformat()
+            self.reformat = False
+
+    def selectedItems(self):
+        """Return the selected indexes that have valid numbers.
+        """
+        return [index for index in self.selectedIndexes() if
+                math.isfinite(self.sweepModel.value(index))]
+
+    def selectedValue(self):
+        """Return number for selected cell.
+        """
+        indexes = self.selectedItems()
+        if indexes:
+            return self.sweepModel.value(indexes[0])
+        return 0.0
+
+
 class ExtraDisplay(QWidget):
-    """Displays registers, history or memory values, allows copies.
+    """Displays registers, history, memory or sweep values, allows copies.
     """
     def __init__(self, dlgRef, parent=None):
         QWidget.__init__(self, parent)
@@ -151,6 +310,10 @@ class ExtraDisplay(QWidget):
         self.tab.addTab(self.histView, '&History')
         self.memView = MemViewWidget(dlgRef.calc)
         self.tab.addTab(self.memView, '&Memory')
+        self.sweepView = SweepViewWidget(dlgRef.calc)
+        self.tab.addTab(self.sweepView, 'S&weep')
+        self.sweepView.selectionModel().selectionChanged.connect(self.
+                                                               enableControls)
         self.tab.setFocus()
         topLay.addWidget(self.tab)
         self.tab.currentChanged.connect(self.tabUpdate)
@@ -166,6 +329,9 @@ class ExtraDisplay(QWidget):
         buttonLay.addWidget(fixedCopyButton)
         fixedCopyButton.clicked.connect(self.copyFixedValue)
         self.buttonList = [setButton, allCopyButton, fixedCopyButton]
+        self.exportButton = QPushButton('&Export\nCSV')
+        buttonLay.addWidget(self.exportButton)
+        self.exportButton.clicked.connect(self.exportSweep)
         closeButton = QPushButton('&Close')
         topLay.addWidget(closeButton)
         closeButton.clicked.connect(self.close)
@@ -196,10 +362,55 @@ class ExtraDisplay(QWidget):
         for button in self.buttonList:
             button.setEnabled(len(self.tab.currentWidget().selectedItems()) >
                                   0)
+        self.exportButton.setEnabled(self.tab.currentWidget() is
+                                     self.sweepView and
+                                     self.sweepView.sweepModel.sweep
+                                     is not None)
+
+    def showSweep(self, sweep):
+        """Show a new sweep in the sweep tab.
+        """
+        self.sweepView.setSweep(sweep)
+        self.tab.setCurrentWidget(self.sweepView)
+        self.enableControls()
+        self.show()
+
+    def exportSweep(self):
+        """Write all points of the sweep to a CSV file.
+
+        Results are calculated and written in chunks, not stored.
+        """
+        sweep = self.sweepView.sweepModel.sweep
+        path, selFilter = QFileDialog.getSaveFileName(self,
+                                    'rpCalc - Export Sweep', '',
+                                    'CSV Files (*.csv);;All Files (*)')
+        if not path:
+            return
+        progress = QProgressDialog('Exporting sweep...', 'Cancel', 0, 1000,
+                                   self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def updateProgress(done, total):
+            progress.setValue(1000 * done // total)
+            qApp.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            sweep.writeCsv(path, updateProgress)
+        except (IOError, OSError) as err:
+            progress.close()
+            QMessageBox.warning(self, 'rpCalc',
+                                'Error exporting {0}:\n{1}'.format(path, err))
+            return
+        progress.close()
 
     def setXValue(self):
         """Copy selected value to calculator X register.
         """
+        if self.dlgRef.worker.busy():
+            QApplication.beep()    # the result would replace the value
+            return
         self.dlgRef.calc.newXValue(self.tab.currentWidget().selectedValue())
         self.dlgRef.updateLcd()
 
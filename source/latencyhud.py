@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# latencyhud.py, provides input to display latency measurement and overlay
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import time
+import json
+import collections
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QLabel
+
+
+class LatencyMonitor:
+    """Times each command from its input event until the LCD is painted.
+
+    Keeps a rolling window of total latencies and optionally writes a trace
+    line for each event with the time spent in each phase.
+    """
+    def __init__(self, windowSize=500):
+        self.enabled = False
+        self.showHud = False     # show overlay at startup
+        self.samples = collections.deque(maxlen=windowSize)
+        self.traceFile = None
+        self.inputNs = 0     # time of the key event being handled
+        self.marks = {}      # phase name -> ns for the event in progress
+        self.label = ''
+        self.hud = None
+
+    def enable(self, tracePath=''):
+        """Start measuring, writing a trace to tracePath if given.
+        """
+        self.enabled = True
+        if tracePath and not self.traceFile:
+            try:
+                self.traceFile = open(tracePath, 'w', encoding='utf-8')
+            except IOError:
+                print('Error - could not write trace file', tracePath)
+
+    def markInput(self):
+        """Note the time a key event arrived, used if it issues a command.
+        """
+        if self.enabled:
+            self.inputNs = time.perf_counter_ns()
+
+    def clearInput(self):
+        """Forget the key event time after the event is handled.
+        """
+        self.inputNs = 0
+
+    def startEvent(self, label):
+        """Start timing a command, unless one is already being timed.
+        """
+        if self.enabled and not self.marks:
+            self.marks['input'] = self.inputNs or time.perf_counter_ns()
+            self.label = label
+
+    def mark(self, phase):
+        """Record the time a phase of the current event was reached.
+        """
+        if self.marks:
+            self.marks[phase] = time.perf_counter_ns()
+
+    def paintDone(self):
+        """Finish the current event when the LCD paint completes.
+        """
+        if not self.marks:
+            return
+        endNs = time.perf_counter_ns()
+        startNs = self.marks['input']
+        totalNs = endNs - startNs
+        self.samples.append(totalNs)
+        if self.traceFile:
+            record = {'event': self.label, 'startNs': startNs,
+                      'totalNs': totalNs}
+            prevNs = startNs
+            # queue is command and timer wait, update is updateLcd time
+            for phase, key in (('update', 'queueNs'), ('updated', 'updateNs')):
+                if phase in self.marks:
+                    record[key] = self.marks[phase] - prevNs
+                    prevNs = self.marks[phase]
+            record['paintNs'] = endNs - prevNs
+            self.traceFile.write(json.dumps(record) + '\n')
+            self.traceFile.flush()
+        self.marks = {}
+        if self.hud:
+            self.hud.updateText()
+
+    def percentile(self, fraction):
+        """Return the latency in ns at fraction of the rolling window.
+        """
+        if not self.samples:
+            return 0
+        values = sorted(self.samples)
+        return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+class LatencyHud(QLabel):
+    """Overlay label showing rolling p50 and p99 latencies.
+    """
+    def __init__(self, monitor, parent=None):
+        QLabel.__init__(self, parent)
+        self.monitor = monitor
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAutoFillBackground(True)
+        self.setMargin(2)
+        self.move(4, 4)
+        self.updateText()
+
+    def updateText(self):
+        """Show the current latency statistics.
+        """
+        self.setText('p50 {0:.2f} ms  p99 {1:.2f} ms  n {2}'.
+                     format(self.monitor.percentile(0.5) / 1e6,
+                            self.monitor.percentile(0.99) / 1e6,
+                            len(self.monitor.samples)))
+        self.adjustSize()
+        self.raise_()
+
+
+monitor = LatencyMonitor()
@@ -47,6 +47,21 @@ class Option:
         self.userDict = {}
         self.dictList = (self.userDict, self.dfltDict)
         self.chgList = []
+        self.readOnly = False   # true for session copies, never written
+
+    def sessionCopy(self):
+        """Return an option set that shares this one's loaded settings.
+
+        The copy reads the same default and user dicts without parsing them
+        again.  Its changes are kept in its own dict and never written to
+        the file.
+        """
+        copy = Option('', self.keySpaces)
+        copy.path = self.path
+        copy.dfltDict = self.dfltDict
+        copy.dictList = (copy.userDict, self.userDict, self.dfltDict)
+        copy.readOnly = True
+        return copy
 
     def loadAll(self, defaultList):
         """Reads defaultList & file, writes file if required
@@ -157,6 +172,9 @@ class Option:
     def writeChanges(self):
         """Write any stored changes to the option file - rtn true on success.
         """
+        if self.readOnly:
+            self.chgList = []
+            return False
         if self.path and self.chgList:
             try:
                 with open(self.path, 'r', encoding='utf-8') as f:
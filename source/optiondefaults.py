@@ -25,6 +25,9 @@ defaultList = [\
     "ForegroundG         0",
     "ForegroundB         0",
     "#",
+    "# File of user defined commands, blank to use the default",
+    "UserFunctionFile    ",
+    "#",
     "# The following options are set from within the program,",
     "# editing here is not recommended",
     "NumDecimalPlaces    4",
@@ -42,6 +45,10 @@ defaultList = [\
     "KeepOnTop           no",
     "AltBaseBits         32",
     "UseTwosComplement   no",
+    "QuantileSketchSize  200",
+    "SolveMaxIter        100",
+    "SolveTolerance      1e-12",
+    "RandomBatchSize     100000",
     "#",
     "# Storage for persistant data",
     "Stack0              0.0",
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# pluginreg.py, finds command plugins and imports them when first used
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import sys
+import os.path
+import re
+import glob
+import importlib.util
+import cmdtrie
+try:
+    from importlib import metadata
+except ImportError:
+    metadata = None
+
+# A plugin file lists its commands in comment lines at the top of the file,
+# so they are known without importing it:
+#     # rpCalc commands: CTOF FTOC
+# The module must have a dict named commands that maps each name to a
+# function.  The function takes the CalcCore, changes its stack and returns
+# an equation string for the history list (or an empty string).
+#
+# Installed packages can also add single commands with entry points in the
+# "rpcalc.commands" group, where the entry point name is the command name
+# and it refers to a function like the above.
+#
+# Names that match, start or start with another command can't be typed, so
+# they are skipped with an error message.
+manifestRe = re.compile(r'#\s*rpcalc commands:\s*(.*)', re.IGNORECASE)
+entryPointGroup = 'rpcalc.commands'
+builtinDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'plugins')
+
+def userDir(optionPath):
+    """Return the user plugin directory that goes with an option file path.
+    """
+    if not optionPath:
+        return ''
+    return os.path.splitext(optionPath)[0] + '-plugins'
+
+def readManifest(path):
+    """Return the command names listed in a plugin file's header comments.
+    """
+    names = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                break
+            match = manifestRe.match(line)
+            if match:
+                names.extend(match.group(1).upper().split())
+    return names
+
+
+class FilePlugin:
+    """A plugin module file, imported when one of its commands is used.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.module = None
+
+    def function(self, name):
+        """Return the function for the command name.
+        """
+        if not self.module:
+            baseName = os.path.splitext(os.path.basename(self.path))[0]
+            moduleName = 'rpcalc_plugin_' + baseName
+            spec = importlib.util.spec_from_file_location(moduleName,
+                                                          self.path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[moduleName] = module
+            spec.loader.exec_module(module)
+            self.module = module
+        return self.module.commands[name]
+
+
+class EntryPointPlugin:
+    """A command from an installed package's entry point.
+    """
+    def __init__(self, entryPoint):
+        self.entryPoint = entryPoint
+
+    def function(self, name):
+        """Return the function for the command name.
+        """
+        return self.entryPoint.load()
+
+
+class PluginRegistry:
+    """Maps command names to plugins and runs plugin commands.
+    """
+    def __init__(self):
+        self.commands = {}     # command name -> plugin
+        self.functions = {}    # command name -> loaded function
+        self.scannedDirs = set()
+        self.entryPointsScanned = False
+
+    def scan(self, dirList, reservedNames=()):
+        """Find plugin commands in dirList and in installed packages.
+
+        Directories already scanned are skipped.  Names that conflict with
+        reservedNames or an earlier plugin command are not added.
+        """
+        for dirPath in dirList:
+            if not dirPath or dirPath in self.scannedDirs:
+                continue
+            self.scannedDirs.add(dirPath)
+            for path in sorted(glob.glob(os.path.join(dirPath, '*.py'))):
+                try:
+                    names = readManifest(path)
+                except (IOError, UnicodeDecodeError):
+                    print('Error - could not read plugin file', path)
+                    continue
+                plugin = FilePlugin(path)
+                for name in names:
+                    self.addCommand(name, plugin, path, reservedNames)
+        if not self.entryPointsScanned and metadata:
+            self.entryPointsScanned = True
+            try:
+                points = metadata.entry_points(group=entryPointGroup)
+            except TypeError:     # before Python 3.10
+                points = metadata.entry_points().get(entryPointGroup, [])
+            for point in points:
+                self.addCommand(point.name.upper(), EntryPointPlugin(point),
+                                point.value, reservedNames)
+
+    def addCommand(self, name, plugin, source, reservedNames):
+        """Add a command name unless it conflicts with another command.
+
+        The source describes where the name came from for the error message.
+        """
+        conflict = cmdtrie.conflictingName(name, list(reservedNames) +
+                                           list(self.commands))
+        if conflict:
+            print('Error - plugin command {0} in {1} conflicts with the {2} '
+                  'command'.format(name, source, conflict))
+            return
+        self.commands[name] = plugin
+
+    def run(self, name, calc):
+        """Run a plugin command on calc, importing the plugin if needed.
+
+        Returns the equation for the history list.  Errors in plugins are
+        raised as ValueError so they show as calculator errors.
+        """
+        func = self.functions.get(name)
+        if not func:
+            try:
+                func = self.commands[name].function(name)
+            except Exception as err:
+                print('Error - could not load plugin command', name, err)
+                raise ValueError
+            self.functions[name] = func
+        try:
+            return func(calc) or ''
+        except (ValueError, ZeroDivisionError, OverflowError):
+            raise
+        except Exception:
+            raise ValueError
+
+
+registry = PluginRegistry()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# convert.py, a plugin with unit conversion commands
+#
+# rpCalc commands: CTOF FTOC KMMI MIKM KGLB LBKG CMIN INCM
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+def linearCmd(name, factor, offset=0.0):
+    """Return a command function that converts X to factor * X + offset.
+    """
+    def convert(calc):
+        eqn = '{0}({1})'.format(name.lower(), calc.formatNum(calc.stack[0]))
+        calc.stack[0] = calc.stack[0] * factor + offset
+        return eqn
+    return convert
+
+
+commands = {'CTOF': linearCmd('CTOF', 1.8, 32.0),
+            'FTOC': linearCmd('FTOC', 1 / 1.8, -32.0 / 1.8),
+            'KMMI': linearCmd('KMMI', 1 / 1.609344),
+            'MIKM': linearCmd('MIKM', 1.609344),
+            'KGLB': linearCmd('KGLB', 1 / 0.45359237),
+            'LBKG': linearCmd('LBKG', 0.45359237),
+            'CMIN': linearCmd('CMIN', 1 / 2.54),
+            'INCM': linearCmd('INCM', 2.54)}
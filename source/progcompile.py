@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# progcompile.py, compiles macros to functions for evaluation over ranges
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import math
+import csv
+import userfunc
+from calccore import Mode
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+maxSweepPoints = 10 ** 8
+nan = float('nan')
+
+# the functions used by compiled programs for scalars or NumPy arrays
+mathFuncs = {'SQRT': math.sqrt, 'SIN': math.sin, 'COS': math.cos,
+             'TAN': math.tan, 'ASIN': math.asin, 'ACOS': math.acos,
+             'ATAN': math.atan, 'LN': math.log, 'LOG': math.log10,
+             'E^X': math.exp, 'POW': math.pow, 'const': float}
+if numpy is not None:
+    numpyFuncs = {'SQRT': numpy.sqrt, 'SIN': numpy.sin, 'COS': numpy.cos,
+                  'TAN': numpy.tan, 'ASIN': numpy.arcsin,
+                  'ACOS': numpy.arccos, 'ATAN': numpy.arctan,
+                  'LN': numpy.log, 'LOG': numpy.log10, 'E^X': numpy.exp,
+                  'POW': numpy.power, 'const': numpy.float64}
+
+
+class CompileError(ValueError):
+    """Raised for commands that can't be compiled.
+    """
+    pass
+
+
+class ProgramCompiler:
+    """Compiles macro tokens to a function of X using a set of functions.
+
+    Each command becomes a closure that maps the four registers to new
+    ones.  Commands with side effects, such as STO or option changes, are
+    not compiled.
+    """
+    def __init__(self, calc, funcs):
+        self.calc = calc
+        self.funcs = funcs
+        self.steps = []
+        self.lift = True    # false after ENT, when a number replaces X
+        self.pending = ''   # command waiting for a register number
+        self.macroNames = set()
+        angleConv = calc.angleConv()
+        pow = funcs['POW']
+        self.binaryCmds = {'+': lambda y, x: y + x,
+                           '-': lambda y, x: y - x,
+                           '*': lambda y, x: y * x,
+                           '/': lambda y, x: y / x,
+                           'Y^X': pow,
+                           'XRT': lambda y, x: pow(y, 1 / x)}
+        sin, cos, tan = funcs['SIN'], funcs['COS'], funcs['TAN']
+        asin, acos, atan = funcs['ASIN'], funcs['ACOS'], funcs['ATAN']
+        self.unaryCmds = {'X^2': lambda x: x * x,
+                          'RCIP': lambda x: 1 / x,
+                          'CHS': lambda x: -x,
+                          'SQRT': funcs['SQRT'],
+                          'SIN': lambda x: sin(x * angleConv),
+                          'COS': lambda x: cos(x * angleConv),
+                          'TAN': lambda x: tan(x * angleConv),
+                          'ASIN': lambda x: asin(x) / angleConv,
+                          'ACOS': lambda x: acos(x) / angleConv,
+                          'ATAN': lambda x: atan(x) / angleConv,
+                          'LN': funcs['LN'],
+                          'LOG': funcs['LOG'],
+                          'E^X': funcs['E^X'],
+                          'TN^X': lambda x: pow(10.0, x)}
+        self.stackCmds = {'ENT': lambda x, y, z, t: (x, x, y, z),
+                          'X<>Y': lambda x, y, z, t: (y, x, z, t),
+                          'R<': lambda x, y, z, t: (y, z, t, x),
+                          'R>': lambda x, y, z, t: (t, x, y, z)}
+
+    def addOps(self, ops):
+        """Compile a list of (position, token, number) ops.
+        """
+        if self.calc.base != 10:
+            raise CompileError('numbers are not decimal')
+        for pos, token, num in ops:
+            if self.pending:
+                self.addRegister(token)
+            elif num is not None:
+                self.addNumber(num)
+            else:
+                self.addCmd(token.upper())
+
+    def addNumber(self, num):
+        """Add a step that pushes a constant or replaces X with it.
+        """
+        num = self.funcs['const'](num)
+        if self.lift:
+            self.steps.append(lambda x, y, z, t: (num, x, y, z))
+        else:
+            self.steps.append(lambda x, y, z, t: (num, y, z, t))
+        self.lift = True
+
+    def addRegister(self, token):
+        """Handle the register number after RCL.
+        """
+        if len(token) != 1 or not '0' <= token <= '9':
+            raise CompileError('bad register')
+        self.pending = ''
+        self.addNumber(self.calc.mem[int(token)])
+
+    def addCmd(self, cmd):
+        """Add the steps for a command.
+        """
+        self.lift = True
+        if cmd in self.binaryCmds:
+            func = self.binaryCmds[cmd]
+            self.steps.append(lambda x, y, z, t: (func(y, x), z, t, t))
+        elif cmd in self.unaryCmds:
+            func = self.unaryCmds[cmd]
+            self.steps.append(lambda x, y, z, t: (func(x), y, z, t))
+        elif cmd in self.stackCmds:
+            self.steps.append(self.stackCmds[cmd])
+            self.lift = cmd != 'ENT'
+        elif cmd == 'CLR':
+            zero = self.funcs['const'](0.0)
+            self.steps.append(lambda x, y, z, t: (zero, zero, zero, zero))
+        elif cmd == '<-':
+            zero = self.funcs['const'](0.0)
+            self.steps.append(lambda x, y, z, t: (zero, y, z, t))
+            self.lift = False
+        elif cmd == 'PI':
+            self.addNumber(math.pi)
+        elif cmd == 'RCL':
+            self.pending = cmd
+        elif cmd in self.calc.macros and cmd not in self.macroNames:
+            self.macroNames.add(cmd)
+            self.addOps(self.calc.macros[cmd])
+            self.macroNames.discard(cmd)
+        else:
+            raise CompileError('{0} can not be compiled'.format(cmd))
+
+    def function(self):
+        """Return a function of X that runs the compiled steps.
+
+        All four registers start with X.
+        """
+        if self.pending:
+            raise CompileError('incomplete command')
+        steps = self.steps
+
+        def program(x):
+            regs = (x, x, x, x)
+            for step in steps:
+                regs = step(*regs)
+            return regs[0]
+
+        return program
+
+
+def scalarFunction(program):
+    """Return a function that gives NaN instead of raising math errors.
+    """
+    def evaluate(x):
+        try:
+            return float(program(x))
+        except (ValueError, ZeroDivisionError, OverflowError, TypeError):
+            return nan
+    return evaluate
+
+def coreFunction(calc, name):
+    """Return a function that runs a command through a core for each X.
+
+    Used for commands that can't be compiled.  Runs on a scratch copy of
+    the core, with memory reset for each evaluation, so the calculator is
+    not changed and the function can be used on another thread.  Numbers
+    are not formatted for display.
+    """
+    core = calc.scratchCopy()
+    core.batchLevel = 1    # no history entries
+    core.formatNum = repr
+    mem = calc.mem[:]
+    ops = ((0, name, None),)
+
+    def evaluate(x):
+        core.stack.replaceAll([x] * 4)
+        core.mem[:] = mem
+        core.flag = Mode.saveMode
+        if core.execOps(ops) or core.flag == Mode.errorMode:
+            return nan
+        return float(core.stack[0])
+
+    return evaluate
+
+def compileScalar(calc, name):
+    """Return a function of a single X value for the named command.
+
+    Macros are compiled if possible, one parameter user functions have
+    their code evaluated directly and other commands are run through the
+    core.
+    """
+    ops = calc.macros.get(name)
+    if ops is not None:
+        compiler = ProgramCompiler(calc, mathFuncs)
+        try:
+            compiler.addOps(ops)
+            return scalarFunction(compiler.function())
+        except CompileError:
+            pass
+    userFunc = calc.userFuncs.get(name)
+    if userFunc and len(userFunc.params) == 1:
+        code = userFunc.code
+        param = userFunc.params[0]
+
+        def evaluate(x):
+            try:
+                return float(eval(code, userfunc.namespace, {param: x}))
+            except Exception:    # math or user code errors
+                return nan
+
+        return evaluate
+    return coreFunction(calc, name)
+
+def compileFunction(calc, name):
+    """Return a function for the named command and whether it uses arrays.
+
+    Macros are compiled for NumPy arrays if possible, otherwise a scalar
+    function is returned.
+    """
+    ops = calc.macros.get(name)
+    if ops is not None and numpy is not None:
+        compiler = ProgramCompiler(calc, numpyFuncs)
+        try:
+            compiler.addOps(ops)
+            return compiler.function(), True
+        except CompileError:
+            pass
+    return compileScalar(calc, name), False
+
+def compileBatch(calc, name):
+    """Return a function that maps a list of X values to a list of results.
+
+    Uses NumPy arrays for the whole list if the command can be compiled
+    for them.
+    """
+    function, vectorized = compileFunction(calc, name)
+    if not vectorized:
+        return lambda xValues: [function(x) for x in xValues]
+
+    def evaluate(xValues):
+        xValues = numpy.asarray(xValues, dtype=float)
+        with numpy.errstate(all='ignore'):
+            results = function(xValues)
+        return numpy.broadcast_to(numpy.asarray(results, dtype=float),
+                                  xValues.shape).tolist()
+
+    return evaluate
+
+
+class Sweep:
+    """Evaluates a command for X from start to stop by step.
+
+    Results are calculated in blocks as needed, so a sweep over many
+    points does not store them all.
+    """
+    blockSize = 4096
+    def __init__(self, calc, name, start, stop, step):
+        if not all(math.isfinite(num) for num in (start, stop, step)) or \
+                step == 0.0 or (stop - start) / step < 0:
+            raise ValueError('The step (X) must move from the start (Z) '
+                             'toward the stop (Y)')
+        numPoints = int(math.floor((stop - start) / step + 1e-9)) + 1
+        if numPoints > maxSweepPoints:
+            raise ValueError('Too many points, the limit is {0}'.
+                             format(maxSweepPoints))
+        self.name = name
+        self.start = start
+        self.step = step
+        self.numPoints = numPoints
+        self.function = compileBatch(calc, name)
+        self.blockStart = -1
+        self.block = []
+
+    def xValue(self, index):
+        """Return the X value for a point.
+        """
+        return self.start + index * self.step
+
+    def values(self, startIndex, count):
+        """Return a list of X values and a list of results for a range.
+        """
+        xValues = [self.start + i * self.step for i in
+                   range(startIndex, startIndex + count)]
+        return xValues, self.function(xValues)
+
+    def value(self, index):
+        """Return the result for a point, calculating its block if needed.
+        """
+        blockStart = index - index % Sweep.blockSize
+        if blockStart != self.blockStart:
+            count = min(Sweep.blockSize, self.numPoints - blockStart)
+            self.block = self.values(blockStart, count)[1]
+            self.blockStart = blockStart
+        return self.block[index - blockStart]
+
+    def writeCsv(self, path, progressFunc=None, chunkSize=65536):
+        """Write all points to a CSV file, calculating them in chunks.
+
+        progressFunc is called with points done and total points, and
+        writing stops if it returns False.  Returns True if completed.
+        """
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['x', self.name])
+            for startIndex in range(0, self.numPoints, chunkSize):
+                count = min(chunkSize, self.numPoints - startIndex)
+                writer.writerows(zip(*self.values(startIndex, count)))
+                if progressFunc and not progressFunc(startIndex + count,
+                                                     self.numPoints):
+                    return False
+        return True
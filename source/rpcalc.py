@@ -21,11 +21,82 @@ helpFilePath = None    # modified by install script if required
 iconPath = None        # modified by install script if required
 
 import sys
-from PyQt5.QtWidgets import QApplication
-import calcdlg
+try:
+    from PyQt5.QtWidgets import QApplication
+    import calcdlg
+    import latencyhud
+except ImportError:    # the --serve mode runs without Qt
+    QApplication = None
+import calcprofile
+import sessiontrace
+import calcserver
+
+
+def intOption(arg, minimum, maximum):
+    """Return the integer value of an --option=value argument.
+
+    Prints a usage error and exits if it is not a number in the range.
+    """
+    name, value = arg.split('=', 1)
+    try:
+        num = int(value)
+    except ValueError:
+        num = minimum - 1
+    if not minimum <= num <= maximum:
+        print('Error - {0} needs a whole number from {1} to {2}'.
+              format(name, minimum, maximum))
+        print('Usage: rpcalc.py --serve[=socket] [--sessions=num] '
+              '[--metrics-port=port]')
+        sys.exit(2)
+    return num
 
 
 if __name__ == '__main__':
+    servePath = None
+    numSessions = calcserver.defaultSessions
+    metricsPort = 0
+    for arg in sys.argv[1:]:
+        if arg == '--profile' or arg.startswith('--profile='):
+            # time core commands, write JSON stats on exit
+            calcprofile.profiler.enable(arg.partition('=')[2] or
+                                        'rpcalc-profile.json')
+            sys.argv.remove(arg)
+        elif arg == '--allocs' or arg.startswith('--allocs='):
+            # measure memory allocated by core commands, write JSON on exit
+            calcprofile.allocProfiler.enable(arg.partition('=')[2] or
+                                             'rpcalc-allocs.json')
+            sys.argv.remove(arg)
+        elif arg == '--serve' or arg.startswith('--serve='):
+            # serve the core on a local socket instead of showing the GUI
+            servePath = arg.partition('=')[2]
+            sys.argv.remove(arg)
+        elif arg.startswith('--sessions='):
+            # number of cores kept for the server
+            numSessions = intOption(arg, 1, 1024)
+            sys.argv.remove(arg)
+        elif arg.startswith('--metrics-port='):
+            # also serve the metrics over HTTP on localhost
+            metricsPort = intOption(arg, 0, 65535)
+            sys.argv.remove(arg)
+        elif arg == '--latency' and QApplication:
+            # show key press to display latency overlay
+            latencyhud.monitor.enable()
+            latencyhud.monitor.showHud = True
+            sys.argv.remove(arg)
+        elif arg.startswith('--trace=') and QApplication:
+            # write per-event latency timings
+            latencyhud.monitor.enable(arg.partition('=')[2])
+            sys.argv.remove(arg)
+        elif arg.startswith('--record='):
+            # write a session trace for replay
+            sessiontrace.recorder.enable(arg.partition('=')[2])
+            sys.argv.remove(arg)
+    if servePath is not None:
+        calcserver.serve(servePath, numSessions, metricsPort)
+        sys.exit(0)
+    if not QApplication:
+        print('Error - PyQt5 is required for the GUI')
+        sys.exit(1)
     userStyle = '-style' in ' '.join(sys.argv)
     app = QApplication(sys.argv)
     if not userStyle and not sys.platform.startswith('win'):
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# sessiontrace.py, records calculator sessions to a binary trace and replays
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import time
+import struct
+import atexit
+import calccore
+
+# The trace file starts with the magic bytes and a version byte.  Each
+# record is a type byte, the time since the previous record in microseconds
+# as an unsigned varint, then the record's data.  Strings are interned: a
+# varint of zero is followed by the length and UTF-8 bytes of a new string,
+# any other varint is one more than the index of an earlier string.
+magic = b'RPCT'
+version = 1
+
+
+class Record:
+    """Enum for trace record types.
+    """
+    state = 1    # starting state - base, flag, stack, memory and options
+    cmd = 2      # CalcCore.cmd - string
+    bulk = 3     # compiled tokens run - string of space separated tokens
+    value = 4    # value pushed with newXValue - double
+    base = 5     # number base change - base and end entry mode bytes
+    option = 6   # option changed outside of commands - key and value strings
+    macro = 7    # macro defined - name and text strings
+    results = 8  # results applied - equation string, count and doubles
+
+
+class TraceWriter:
+    """Writes trace records to a binary file.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(magic + bytes([version]))
+        self.strings = {}
+        self.lastNs = time.perf_counter_ns()
+
+    def writeVarint(self, num):
+        """Write an unsigned integer using 7 bits per byte.
+        """
+        data = bytearray()
+        while num >= 0x80:
+            data.append((num & 0x7f) | 0x80)
+            num >>= 7
+        data.append(num)
+        self.file.write(data)
+
+    def writeString(self, text):
+        """Write a string, interning it for later reuse.
+        """
+        index = self.strings.get(text)
+        if index is not None:
+            self.writeVarint(index + 1)
+            return
+        self.strings[text] = len(self.strings)
+        data = text.encode('utf-8')
+        self.writeVarint(0)
+        self.writeVarint(len(data))
+        self.file.write(data)
+
+    def startRecord(self, recordType):
+        """Write the type and time delta that begin each record.
+        """
+        nowNs = time.perf_counter_ns()
+        self.file.write(bytes([recordType]))
+        self.writeVarint((nowNs - self.lastNs) // 1000)
+        self.lastNs = nowNs
+
+    def writeState(self, calc):
+        """Write the core's current state and options.
+        """
+        self.startRecord(Record.state)
+        self.file.write(bytes([calc.base, calc.flag - calccore.Mode.entryMode]))
+        self.file.write(struct.pack('<14d', *(list(calc.stack) + calc.mem)))
+        options = dict(calc.option.dfltDict, **calc.option.userDict)
+        self.writeVarint(len(options))
+        for key, value in options.items():
+            self.writeString(key)
+            self.writeString(value)
+
+    def close(self):
+        """Flush and close the file.
+        """
+        if not self.file.closed:
+            self.file.close()
+
+
+class SessionRecorder:
+    """Records the commands sent to a core if enabled.
+
+    Like the profiler, recording replaces methods on the core instance, so
+    there is no overhead unless enabled before the core is created.
+    Statistics and data registers are not part of the starting state.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.path = ''
+        self.writer = None
+        self.calc = None
+        self.options = {}
+
+    def enable(self, path):
+        """Turn on recording to a trace file at path.
+        """
+        self.enabled = True
+        self.path = path
+
+    def recordCore(self, calc):
+        """Start recording a CalcCore's commands and option changes.
+
+        Only the first core created is recorded.
+        """
+        if not self.enabled or self.writer:
+            return
+        try:
+            self.writer = TraceWriter(self.path)
+        except IOError:
+            print('Error - could not write trace file', self.path)
+            self.enabled = False
+            return
+        atexit.register(self.writer.close)
+        self.calc = calc
+        self.writer.writeState(calc)
+        self.options = calc.option.userDict.copy()
+        writer = self.writer
+
+        def recordCmd(cmdStr, method=calc.cmd):
+            writer.startRecord(Record.cmd)
+            writer.writeString(cmdStr)
+            return method(cmdStr)
+
+        def recordOps(ops, method=calc.runOps):
+            writer.startRecord(Record.bulk)
+            writer.writeString(' '.join(op[1] for op in ops))
+            return method(ops)
+
+        def recordValue(value, method=calc.newXValue):
+            writer.startRecord(Record.value)
+            writer.file.write(struct.pack('<d', float(value)))
+            method(value)
+
+        def recordBase(base, endEntryMode=True, method=calc.setBase):
+            writer.startRecord(Record.base)
+            writer.file.write(bytes([base, bool(endEntryMode)]))
+            method(base, endEntryMode)
+
+        def recordMacro(name, text, store=True, method=calc.defineMacro):
+            writer.startRecord(Record.macro)
+            writer.writeString(name)
+            writer.writeString(text)
+            method(name, text, store)
+            if store:
+                self.options[calccore.CalcCore.macroPrefix + name] = text
+
+        def recordResults(eqn, values, method=calc.applyResults):
+            writer.startRecord(Record.results)
+            writer.writeString(eqn)
+            writer.writeVarint(len(values))
+            writer.file.write(struct.pack('<{0}d'.format(len(values)),
+                                          *values))
+            method(eqn, values)
+
+        def recordScratch(scratch, cmdStr='', method=calc.applyScratch):
+            writer.startRecord(Record.cmd)     # replays as the command
+            writer.writeString(cmdStr)
+            method(scratch, cmdStr)
+
+        calc.cmd = recordCmd
+        calc.runOps = recordOps
+        calc.newXValue = recordValue
+        calc.setBase = recordBase
+        calc.defineMacro = recordMacro
+        calc.applyResults = recordResults
+        calc.applyScratch = recordScratch
+        calc.addListener(self.calcChanged)
+
+    def calcChanged(self, event, data):
+        """Record options changed outside of commands.
+
+        Changes made by commands have a key and are reproduced by replaying
+        the command, so they only update the saved copy.
+        """
+        if event != calccore.Event.optChange:
+            return
+        userDict = self.calc.option.userDict
+        if data:
+            self.options[data] = userDict.get(data)
+            return
+        for key, value in userDict.items():
+            if self.options.get(key) != value:
+                self.writer.startRecord(Record.option)
+                self.writer.writeString(key)
+                self.writer.writeString(value)
+        self.options = userDict.copy()
+
+
+class SessionTrace:
+    """Reads a trace file into a list of (time in usec, type, data) records.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        if self.data[:len(magic)] != magic or \
+                self.data[len(magic)] != version:
+            raise ValueError('not an rpCalc trace file')
+        self.pos = len(magic) + 1
+        self.strings = []
+        self.records = []
+        timeUs = 0
+        while self.pos < len(self.data):
+            recordType = self.data[self.pos]
+            self.pos += 1
+            timeUs += self.readVarint()
+            self.records.append((timeUs, recordType,
+                                 self.readData(recordType)))
+        del self.data
+
+    def readVarint(self):
+        """Return an unsigned integer read 7 bits per byte.
+        """
+        num = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            num |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return num
+            shift += 7
+
+    def readString(self):
+        """Return a new or previously interned string.
+        """
+        index = self.readVarint()
+        if index:
+            return self.strings[index - 1]
+        length = self.readVarint()
+        text = self.data[self.pos:self.pos + length].decode('utf-8')
+        self.pos += length
+        self.strings.append(text)
+        return text
+
+    def readDoubles(self, count):
+        """Return a tuple of count doubles.
+        """
+        values = struct.unpack_from('<{0}d'.format(count), self.data,
+                                    self.pos)
+        self.pos += 8 * count
+        return values
+
+    def readData(self, recordType):
+        """Return the data for a record of the given type.
+        """
+        if recordType in (Record.cmd, Record.bulk):
+            return self.readString()
+        if recordType == Record.value:
+            return self.readDoubles(1)[0]
+        if recordType == Record.base:
+            self.pos += 2
+            return (self.data[self.pos - 2], bool(self.data[self.pos - 1]))
+        if recordType in (Record.option, Record.macro):
+            return (self.readString(), self.readString())
+        if recordType == Record.results:
+            eqn = self.readString()
+            return (eqn, self.readDoubles(self.readVarint()))
+        if recordType == Record.state:
+            base, flag = self.data[self.pos:self.pos + 2]
+            self.pos += 2
+            numbers = self.readDoubles(14)
+            options = {}
+            for i in range(self.readVarint()):
+                key = self.readString()
+                options[key] = self.readString()
+            return (base, flag + calccore.Mode.entryMode, numbers[:4],
+                    list(numbers[4:]), options)
+        raise ValueError('unknown trace record type {0}'.format(recordType))
+
+    def commandCount(self):
+        """Return the number of records that run commands.
+        """
+        return sum(1 for record in self.records if record[1] != Record.state)
+
+    def replay(self, calc, realTime=False, speed=1.0):
+        """Run the trace through calc and return the elapsed seconds.
+
+        Runs as fast as possible unless realTime is true, when the recorded
+        delays (divided by speed) are kept.
+        """
+        startTime = time.perf_counter()
+        for timeUs, recordType, data in self.records:
+            if realTime:
+                delay = (startTime + timeUs / 1e6 / speed -
+                         time.perf_counter())
+                if delay > 0:
+                    time.sleep(delay)
+            if recordType == Record.cmd:
+                calc.cmd(data)
+            elif recordType == Record.bulk:
+                calc.bulkCmd(data)
+            elif recordType == Record.value:
+                calc.newXValue(data)
+            elif recordType == Record.base:
+                calc.setBase(*data)
+            elif recordType == Record.option:
+                applyOption(calc, *data)
+            elif recordType == Record.macro:
+                calc.defineMacro(*data)
+            elif recordType == Record.results:
+                calc.applyResults(*data)
+            elif recordType == Record.state:
+                base, flag, stack, mem, options = data
+                for key, value in options.items():
+                    if key in calc.option.dfltDict or \
+                            key in calc.option.userDict:
+                        calc.option.changeData(key, value, False)
+                    else:
+                        calc.option.addData(key, value)
+                calc.loadMacros()
+                calc.setAltBaseOptions()
+                calc.setStatOptions()
+                calc.stack.replaceAll(stack)
+                calc.mem = mem
+                calc.base = base
+                calc.updateXStr()
+                calc.flag = flag
+                calc.optionsChanged()
+        return time.perf_counter() - startTime
+
+
+def applyOption(calc, key, value):
+    """Change an option the way the option dialog does.
+    """
+    if calc.option.changeData(key, value, True):
+        calc.option.writeChanges()
+        calc.setAltBaseOptions()
+        calc.setStatOptions()
+        calc.optionsChanged()
+        calc.updateXStr()
+
+
+recorder = SessionRecorder()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+#****************************************************************************
+# userfunc.py, reads user defined commands from a file with a compiled cache
+#
+# rpCalc, an RPN calculator
+# Copyright (C) 2020, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#*****************************************************************************
+
+import os
+import re
+import math
+import marshal
+import hashlib
+import importlib.util
+import cmdtrie
+
+# Each line of the file defines a command, either as RPN tokens or as a
+# Python expression with up to four parameters, the last one taken from X:
+#     HYP = X^2 X<>Y X^2 + SQRT
+#     DIV(a, b) = a / b
+# Blank lines and lines starting with # are ignored.
+lineRe = re.compile(r'([A-Za-z][A-Za-z0-9]+)\s*(?:\(([^)]*)\))?\s*=\s*(.+)$')
+maxParams = 4
+# code objects are only valid for the Python version that compiled them
+cacheMagic = importlib.util.MAGIC_NUMBER + b'rpcalc1'
+
+# names available to Python expressions
+namespace = {name: getattr(math, name) for name in dir(math) if
+             not name.startswith('_')}
+namespace['__builtins__'] = {'abs': abs, 'min': min, 'max': max,
+                             'round': round, 'int': int, 'float': float,
+                             'pow': pow}
+
+def defaultPath(optionPath):
+    """Return the function file path that goes with an option file path.
+    """
+    if not optionPath:
+        return ''
+    base, ext = os.path.splitext(optionPath)
+    return '{0}-functions{1}'.format(base, ext)
+
+
+class PythonFunction:
+    """A command that evaluates a compiled Python expression.
+    """
+    def __init__(self, name, params, code):
+        self.name = name
+        self.params = params
+        self.code = code
+
+    def run(self, calc):
+        """Replace the parameter registers with the result.
+
+        Returns the equation for the history list.
+        """
+        numParams = len(self.params)
+        values = calc.stack[numParams - 1::-1] if numParams else []
+        try:
+            result = float(eval(self.code, namespace,
+                                dict(zip(self.params, values))))
+        except (ValueError, ZeroDivisionError, OverflowError):
+            raise
+        except Exception:    # errors in user code show as error 0
+            raise ValueError
+        eqn = '{0}({1})'.format(self.name, ', '.join(calc.formatNum(num).
+                                                     strip()
+                                                     for num in values))
+        if not numParams:
+            calc.stack.enterX()
+        for i in range(numParams - 1):
+            calc.stack.replaceXY(0.0)
+        calc.stack[0] = result
+        return eqn
+
+
+class FunctionLibrary:
+    """Loads the commands in a user function file.
+
+    Compiled definitions are stored in a cache file beside the source.  The
+    cache is used without reading the source if the modification time and
+    size match, or after hashing the source if only the time changed.
+    Names that match, start or start with an existing command, and so can't
+    be typed, are reported as errors.
+    """
+    def __init__(self, path, cmdNames=()):
+        self.path = path
+        self.cmdNames = cmdNames
+        self.cachePath = path + '.cache'
+        self.rpnFuncs = {}    # name -> compiled token list
+        self.pyFuncs = {}     # name -> PythonFunction
+        self.errors = []
+
+    def load(self, compileTokens):
+        """Read the functions, using compileTokens(text) for RPN tokens.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        cache = self.readCache()
+        if cache and cache[1:3] == (stat.st_mtime_ns, stat.st_size):
+            self.setEntries(cache[4], cache[5])
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except IOError:
+            print('Error - could not read function file', self.path)
+            return
+        sourceHash = hashlib.sha1(data).hexdigest()
+        if cache and cache[3] == sourceHash:
+            entries, errors = cache[4], cache[5]
+        else:
+            entries, errors = self.parse(data.decode('utf-8',
+                                                     errors='replace'),
+                                         compileTokens)
+        self.setEntries(entries, errors)
+        self.writeCache((cacheMagic, stat.st_mtime_ns, stat.st_size,
+                         sourceHash, entries, errors))
+
+    def parse(self, text, compileTokens):
+        """Return lists of cache entries and error messages from the text.
+        """
+        entries = []
+        errors = []
+        for lineNum, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            match = lineRe.match(line)
+            if not match:
+                errors.append('line {0}: not a definition'.format(lineNum))
+                continue
+            name, params, body = match.groups()
+            name = name.upper()
+            if params is None:
+                entries.append(('rpn', name, compileTokens(body)))
+                continue
+            params = tuple(param.strip() for param in params.split(',')
+                           if param.strip())
+            if len(params) > maxParams or \
+                    not all(param.isidentifier() for param in params):
+                errors.append('line {0}: bad parameters'.format(lineNum))
+                continue
+            try:
+                # pad with new lines so errors report the file line number
+                code = compile('\n' * (lineNum - 1) + body.strip(),
+                               self.path, 'eval')
+            except SyntaxError as err:
+                errors.append('line {0}: {1}'.format(lineNum, err.msg))
+                continue
+            entries.append(('py', name, params, code))
+        return entries, errors
+
+    def setEntries(self, entries, errors):
+        """Create the functions from cache entries.
+        """
+        errors = errors[:]
+        names = list(self.cmdNames)
+        for entry in entries:
+            conflict = cmdtrie.conflictingName(entry[1], names)
+            if conflict:
+                errors.append('{0}: name {1} the {2} command'.
+                              format(entry[1], 'matches' if conflict ==
+                                     entry[1] else 'conflicts with',
+                                     conflict))
+                continue
+            names.append(entry[1])
+            if entry[0] == 'rpn':
+                self.rpnFuncs[entry[1]] = entry[2]
+            else:
+                self.pyFuncs[entry[1]] = PythonFunction(*entry[1:])
+        self.errors = errors
+
+    def readCache(self):
+        """Return the cache contents tuple, or None if missing or invalid.
+        """
+        try:
+            with open(self.cachePath, 'rb') as f:
+                cache = marshal.load(f)
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(cache, tuple) or len(cache) != 6 or \
+                cache[0] != cacheMagic:
+            return None
+        return cache
+
+    def writeCache(self, cache):
+        """Write the cache file, replacing any old one in a single step.
+        """
+        tmpPath = self.cachePath + '.tmp'
+        try:
+            with open(tmpPath, 'wb') as f:
+                marshal.dump(cache, f)
+            os.replace(tmpPath, self.cachePath)
+        except (IOError, OSError):
+            pass    # the cache is optional